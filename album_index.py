@@ -0,0 +1,251 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from PIL import ExifTags, Image
+
+
+# Lives inside the album directory so it moves with the pictures
+INDEX_NAME = ".album.sqlite3"
+IMAGE_SUFFIX = ".jpg"
+
+ORDERS = ('name', 'captured_at')
+
+AlbumEntry = namedtuple(
+    'AlbumEntry', 'name path captured_at size width height phash'
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    mtime_ns INTEGER NOT NULL,
+    phash TEXT
+);
+CREATE INDEX IF NOT EXISTS images_captured_at ON images (captured_at);
+"""
+
+_COLUMNS = "name, path, captured_at, size, width, height, phash"
+# Keeps the perceptual hash unless the file itself changed
+_UPSERT = (
+    "INSERT INTO images "
+    "(name, path, captured_at, size, width, height, mtime_ns) "
+    "VALUES (:name, :path, :captured_at, :size, :width, :height, :mtime_ns) "
+    "ON CONFLICT (name) DO UPDATE SET "
+    "path = excluded.path, captured_at = excluded.captured_at, size = excluded.size, "
+    "width = excluded.width, height = excluded.height, "
+    "phash = CASE WHEN images.mtime_ns = excluded.mtime_ns THEN images.phash END, "
+    "mtime_ns = excluded.mtime_ns"
+)
+
+
+def _capture_time(image, stat):
+    """EXIF DateTimeOriginal (or DateTime) as a timestamp, else the mtime"""
+    try:
+        exif = image.getexif()
+        value = (exif.get_ifd(ExifTags.IFD.Exif).get(ExifTags.Base.DateTimeOriginal)
+                 or exif.get(ExifTags.Base.DateTime))
+        if value:
+            return datetime.strptime(value.strip('\0 '), "%Y:%m:%d %H:%M:%S").timestamp()
+    except Exception:
+        pass
+    return stat.st_mtime
+
+
+def read_metadata(path):
+    """Index row for an image file; only the header is parsed"""
+    stat = os.stat(path)
+    width = height = None
+    captured_at = stat.st_mtime
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            captured_at = _capture_time(image, stat)
+    except Exception as e:
+        logging.warning(f"Could not read {path}: {e}")
+    return {
+        'name': os.path.basename(path),
+        'path': str(path),
+        'captured_at': captured_at,
+        'size': stat.st_size,
+        'width': width,
+        'height': height,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+
+class AlbumIndex:
+    """SQLite index of the images in one album directory
+
+    Replaces listing and sorting the directory on every refresh: callers
+    ask for a count and one page at a time. The app updates it as it
+    writes files (add/rename/remove); rebuild() resyncs it with the disk
+    after anything else touched the directory.
+    """
+    def __init__(self, directory, db_path=None):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.db_path = db_path or os.path.join(self.directory, INDEX_NAME)
+
+        fresh = not os.path.exists(self.db_path)
+        # Shared with background writers, so serialize access ourselves
+        self._lock = threading.Lock()
+        self._hash_subscribers = []
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(images)")]
+            if 'phash' not in columns:
+                # Index written before hashes were stored
+                self._db.execute("ALTER TABLE images ADD COLUMN phash TEXT")
+
+        if fresh:
+            self.rebuild()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def add(self, path):
+        """Insert or refresh the entry for an image file"""
+        row = read_metadata(path)
+        with self._lock, self._db:
+            self._db.execute(_UPSERT, row)
+
+    def set_hash(self, name, phash):
+        """Store the perceptual hash (an int, see image_hash) for an entry"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE images SET phash = ? WHERE name = ?", (f"{phash:016x}", name)
+            )
+            subscribers = list(self._hash_subscribers)
+        for callback in subscribers:
+            callback(name, phash)
+
+    def subscribe_hashes(self, callback):
+        """Call callback(name, hash) after each set_hash, on the writer's thread"""
+        with self._lock:
+            self._hash_subscribers.append(callback)
+
+    def hashes(self):
+        """(name, hash) for every entry that has one"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, phash FROM images WHERE phash IS NOT NULL"
+            ).fetchall()
+        return [(name, int(phash, 16)) for name, phash in rows]
+
+    def unhashed(self, limit=-1):
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT name FROM images WHERE phash IS NULL ORDER BY name LIMIT ?", (limit,)
+            )]
+
+    def remove(self, path):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM images WHERE name = ?", (os.path.basename(path),))
+
+    def rename(self, old_path, new_path):
+        """Move an entry to its new name (the file must already be renamed)"""
+        self.remove(old_path)
+        self.add(new_path)
+
+    def rebuild(self):
+        """Resync with the directory; returns (added/updated, removed) counts"""
+        on_disk = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(IMAGE_SUFFIX) and entry.is_file():
+                    on_disk[entry.name] = entry.stat().st_mtime_ns
+
+        with self._lock:
+            known = dict(self._db.execute("SELECT name, mtime_ns FROM images"))
+
+        stale = [name for name in known if name not in on_disk]
+        changed = [name for name, mtime in on_disk.items() if known.get(name) != mtime]
+
+        rows = []
+        for name in changed:
+            try:
+                rows.append(read_metadata(self._path(name)))
+            except OSError:
+                # Deleted while we were scanning
+                stale.append(name)
+
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM images WHERE name = ?", [(n,) for n in stale])
+            self._db.executemany(_UPSERT, rows)
+        if rows or stale:
+            logging.info(f"Album index {self.directory}: {len(rows)} updated, {len(stale)} removed")
+        return len(rows), len(stale)
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def page(self, offset=0, limit=-1, order='name', descending=False):
+        """Entries in the given order; limit -1 means all of them"""
+        if order not in ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM images ORDER BY {order} {direction}, name {direction} "
+                "LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [AlbumEntry(*row) for row in rows]
+
+    def get(self, name):
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM images WHERE name = ?", (name,)
+            ).fetchone()
+        return AlbumEntry(*row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_album_index(directory):
+    """Return the shared index for an album directory"""
+    key = os.path.abspath(str(directory))
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = AlbumIndex(directory)
+        return _indexes[key]
+
+
+def main(argv):
+    """python album_index.py rebuild|list [directory]"""
+    command = argv[1] if len(argv) > 1 else 'rebuild'
+    directory = argv[2] if len(argv) > 2 else "captured_images"
+    index = AlbumIndex(directory)
+    if command == 'rebuild':
+        updated, removed = index.rebuild()
+        print(f"{index.count()} images indexed ({updated} updated, {removed} removed)")
+    elif command == 'list':
+        for entry in index.page(order='captured_at'):
+            captured = datetime.fromtimestamp(entry.captured_at).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{captured}  {entry.width}x{entry.height}  {entry.size:>8}  {entry.name}")
+    else:
+        print(main.__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main(sys.argv))
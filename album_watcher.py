@@ -0,0 +1,279 @@
+import ctypes
+import logging
+import os
+import select
+import struct
+import threading
+from collections import namedtuple
+
+from album_index import IMAGE_SUFFIX, get_album_index
+from image_derivatives import drop_stale_derivative, rename_derivative
+
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT = struct.Struct('iIII')
+
+# Events arriving this close together are applied as one batch
+SETTLE_S = 0.1
+POLL_INTERVAL_S = 2.0
+
+# kind is 'added', 'removed', 'renamed' (old_name set) or 'resync' (no name)
+AlbumChange = namedtuple('AlbumChange', 'kind name old_name')
+
+
+def _inotify():
+    """(libc, fd) or None if inotify isn't available here"""
+    try:
+        libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    return libc, fd
+
+
+class AlbumWatcher:
+    """Keeps an AlbumIndex in step with files changed outside the app
+
+    Uses inotify on the album directory and falls back to polling its
+    listing when that isn't available. Each batch of changes is written
+    to the index, then handed to the subscribers as a list of
+    AlbumChange. Subscribers are called on the watcher thread.
+    """
+    def __init__(self, index, poll_interval=POLL_INTERVAL_S):
+        self.index = index
+        self.directory = index.directory
+        self.poll_interval = poll_interval
+        self.mode = None
+
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._wake_r = self._wake_w = None
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def is_alive(self):
+        """False before start(), after stop() or once the directory went away"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start watching; restarts a watcher whose thread has ended"""
+        if self.is_alive():
+            return
+        # The old thread is gone, so nothing else can be using its pipe
+        self._close_wake()
+        self._stop.clear()
+        # Lets stop() interrupt the blocking select
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wake_w is not None:
+            os.write(self._wake_w, b'x')
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            if self._thread.is_alive():
+                # Still busy (e.g. a slow resync); it exits on its own and
+                # the pipe is left to it rather than closed underneath it
+                return
+            self._thread = None
+        self._close_wake()
+
+    def _close_wake(self):
+        # Only called once the thread is done with the pipe
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._wake_r = self._wake_w = None
+
+    def _run(self):
+        # Catch up on whatever changed while nobody was watching
+        self._resync()
+
+        watch = _inotify()
+        if watch is not None:
+            libc, fd = watch
+            if libc.inotify_add_watch(fd, self.directory.encode(), WATCH_MASK) >= 0:
+                self.mode = 'inotify'
+                try:
+                    self._watch(fd)
+                finally:
+                    os.close(fd)
+                return
+            os.close(fd)
+            logging.warning(f"inotify_add_watch failed for {self.directory}: "
+                            f"{os.strerror(ctypes.get_errno())}")
+
+        self.mode = 'poll'
+        logging.info(f"Watching {self.directory} by polling every {self.poll_interval}s")
+        self._poll()
+
+    def _resync(self):
+        try:
+            updated, removed = self.index.rebuild()
+        except OSError as e:
+            logging.warning(f"Album resync failed: {e}")
+            return
+        if updated or removed:
+            # No detail on what moved; subscribers just reload
+            self._publish([AlbumChange('resync', None, None)])
+
+    def _watch(self, fd):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([fd, self._wake_r], [], [])
+            if self._wake_r in ready:
+                break
+            raw = self._read_batch(fd)
+            if raw is None:
+                self._resync()
+                continue
+            self._apply(self._parse(raw))
+
+    def _read_batch(self, fd):
+        """Read events until the directory goes quiet; None on queue overflow"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(os.read(fd, 64 * 1024))
+            except BlockingIOError:
+                pass
+            ready, _, _ = select.select([fd], [], [], SETTLE_S)
+            if not ready:
+                break
+        raw = b''.join(chunks)
+        offset = 0
+        while offset < len(raw):
+            _, mask, _, length = _EVENT.unpack_from(raw, offset)
+            if mask & IN_Q_OVERFLOW:
+                return None
+            offset += _EVENT.size + length
+        return raw
+
+    def _parse(self, raw):
+        changes = []
+        moved_from = {}
+        offset = 0
+        while offset < len(raw):
+            _, mask, cookie, length = _EVENT.unpack_from(raw, offset)
+            name = raw[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            name = os.fsdecode(name)
+            offset += _EVENT.size + length
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                logging.warning(f"Album directory {self.directory} went away")
+                self._stop.set()
+                continue
+            if not name.endswith(IMAGE_SUFFIX):
+                # A temp file renamed into place still counts as an add
+                if mask & IN_MOVED_FROM:
+                    moved_from[cookie] = None
+                continue
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = name
+                changes.append(AlbumChange('removed', name, None))
+            elif mask & IN_MOVED_TO:
+                old_name = moved_from.pop(cookie, None)
+                if old_name is not None:
+                    changes.remove(AlbumChange('removed', old_name, None))
+                    changes.append(AlbumChange('renamed', name, old_name))
+                else:
+                    changes.append(AlbumChange('added', name, None))
+            elif mask & IN_CLOSE_WRITE:
+                changes.append(AlbumChange('added', name, None))
+            elif mask & IN_DELETE:
+                changes.append(AlbumChange('removed', name, None))
+        return changes
+
+    def _poll(self):
+        snapshot = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            if current == snapshot:
+                continue
+            changes = [AlbumChange('removed', name, None)
+                       for name in snapshot if name not in current]
+            changes += [AlbumChange('added', name, None)
+                        for name, stamp in current.items() if snapshot.get(name) != stamp]
+            snapshot = current
+            self._apply(changes)
+
+    def _snapshot(self):
+        result = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(IMAGE_SUFFIX):
+                        stat = entry.stat()
+                        result[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logging.warning(f"Could not list {self.directory}: {e}")
+        return result
+
+    def _apply(self, changes):
+        if not changes:
+            return
+        for change in changes:
+            path = os.path.join(self.directory, change.name)
+            try:
+                if change.kind == 'removed':
+                    self.index.remove(path)
+                    drop_stale_derivative(path)
+                elif change.kind == 'renamed':
+                    old_path = os.path.join(self.directory, change.old_name)
+                    rename_derivative(old_path, path)
+                    self.index.rename(old_path, path)
+                else:
+                    self.index.add(path)
+                    drop_stale_derivative(path)
+            except OSError:
+                # Gone again before we got to it
+                self.index.remove(path)
+        self._publish(changes)
+
+    def _publish(self, changes):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.error(f"Album change subscriber failed: {e}")
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_album_watcher(directory):
+    """Return the running watcher for an album directory, starting it if needed"""
+    index = get_album_index(directory)
+    with _watchers_lock:
+        key = os.path.abspath(index.directory)
+        if key not in _watchers:
+            _watchers[key] = AlbumWatcher(index)
+        # Also brings back one that stopped when the directory went away
+        _watchers[key].start()
+        return _watchers[key]
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from PIL import ImageTk
+
+from camera_service import PREVIEW_SIZE, CameraError
+
+
+class LivePreview:
+    """Paints the camera stream into a Tk label
+
+    A worker thread pulls and decodes frames; only the newest decoded frame
+    is kept, so if the Tk loop is busy the stale ones are dropped instead of
+    piling up. The Tk side just pastes that frame into a reused PhotoImage.
+    """
+    def __init__(self, label, camera, size=PREVIEW_SIZE, poll_ms=15):
+        self.label = label
+        self.camera = camera
+        self.size = size
+        self.poll_ms = poll_ms
+
+        self.photo = None
+        self.running = False
+        self.frames_shown = 0
+        self.frames_dropped = 0
+
+        self._lock = threading.Lock()
+        self._latest = None
+        self._paint_times = deque(maxlen=30)
+        self._decode_ms = deque(maxlen=30)
+        self._worker = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        self.label.after(self.poll_ms, self._paint)
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        seq = 0
+        while self.running:
+            start = time.perf_counter()
+            try:
+                new_seq, image = self.camera.preview_frame(seq, self.size)
+            except (CameraError, OSError) as e:
+                logging.warning(f"Preview frame failed: {e}")
+                time.sleep(0.2)
+                continue
+            if image is None:
+                # Camera stopped or not started yet; don't spin waiting for it
+                time.sleep(0.2)
+                continue
+            decode_ms = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                if self._latest is not None:
+                    self.frames_dropped += 1
+                self._latest = image
+                self._decode_ms.append(decode_ms)
+            seq = new_seq
+
+    def _paint(self):
+        if not self.running:
+            return
+        with self._lock:
+            image, self._latest = self._latest, None
+
+        if image is not None:
+            if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+                self.photo = ImageTk.PhotoImage(image)
+                self.label.configure(image=self.photo)
+            else:
+                self.photo.paste(image)
+            self.frames_shown += 1
+            self._paint_times.append(time.perf_counter())
+
+        try:
+            self.label.after(self.poll_ms, self._paint)
+        except Exception:
+            # Label destroyed
+            self.stop()
+
+    def stats(self):
+        """Achieved preview rate and average worker time over the last frames"""
+        with self._lock:
+            decode = list(self._decode_ms)
+        times = list(self._paint_times)
+        fps = 0.0
+        if len(times) > 1 and times[-1] > times[0]:
+            fps = (len(times) - 1) / (times[-1] - times[0])
+        return {
+            'fps': fps,
+            'decode_ms': sum(decode) / len(decode) if decode else 0.0,
+            'shown': self.frames_shown,
+            'dropped': self.frames_dropped
+        }
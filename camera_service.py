@@ -0,0 +1,665 @@
+import atexit
+import io
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import cv2
+from PIL import Image, ImageDraw
+
+from process_supervisor import LifecycleMetrics, ProcessSupervisor
+
+try:
+    from picamera2 import Picamera2
+except ImportError:  # Only available on the Pi with python3-picamera2
+    Picamera2 = None
+
+
+CAPTURE_WIDTH = 2304
+CAPTURE_HEIGHT = 1296
+PREVIEW_SIZE = (640, 360)
+
+
+class CaptureProfile:
+    """Sensor mode, output size, frame rate and JPEG quality for captures"""
+    def __init__(self, name, width, height, quality, framerate=10,
+                 sensor_mode=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.framerate = framerate
+        # libcamera "W:H:bit-depth:packing" sensor mode, None to let it pick
+        self.sensor_mode = sensor_mode
+
+
+CAPTURE_PROFILES = {
+    # Stored originals: the 2x2 binned full-field mode at high quality
+    'archive': CaptureProfile('archive', CAPTURE_WIDTH, CAPTURE_HEIGHT, 93,
+                              framerate=10, sensor_mode="2304:1296:10:P"),
+    # Same field of view, sized for the largest on-screen rendering
+    'display': CaptureProfile('display', 1152, 648, 85,
+                              framerate=15, sensor_mode="2304:1296:10:P"),
+    # Smaller, faster sensor mode for quick bursts and the 480x320 screen
+    'fast': CaptureProfile('fast', 768, 432, 75,
+                           framerate=30, sensor_mode="1536:864:10:P"),
+}
+DEFAULT_PROFILE = 'archive'
+
+# Backend selection: "libcamera", "picamera2" or "sim" (default: best available)
+CAMERA_BACKEND_ENV = "FLASHCARD_CAMERA"
+# Simulator settings
+SIM_DIR_ENV = "FLASHCARD_CAMERA_DIR"
+SIM_LATENCY_ENV = "FLASHCARD_CAMERA_LATENCY_MS"
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+
+# Capture states, in the order a successful capture goes through them
+IDLE = 'idle'
+CAPTURING = 'capturing'
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class CameraError(Exception):
+    """Raised when the camera pipeline cannot deliver a frame"""
+
+
+class CameraBackend:
+    """Interface for a camera that keeps the sensor streaming between captures"""
+    name = "base"
+
+    def __init__(self):
+        # Startup/teardown/capture timings and crash counts
+        self.metrics = LifecycleMetrics()
+        self.profile = DEFAULT_PROFILE
+        self.sensor_mode = CAPTURE_PROFILES[DEFAULT_PROFILE].sensor_mode
+
+    def configure(self, profile):
+        """Switch to a CaptureProfile, restarting the stream if anything changed"""
+        settings = {
+            'width': profile.width,
+            'height': profile.height,
+            'quality': profile.quality,
+            'framerate': profile.framerate,
+            'sensor_mode': profile.sensor_mode
+        }
+        changed = any(
+            hasattr(self, key) and getattr(self, key) != value
+            for key, value in settings.items()
+        )
+        for key, value in settings.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+        self.profile = profile.name
+
+        if changed and self.is_running():
+            self.stop()
+            self.start()
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def is_running(self):
+        raise NotImplementedError
+
+    def capture_jpeg(self, timeout=5.0):
+        """Return JPEG bytes of a frame taken after this call was made"""
+        raise NotImplementedError
+
+    def capture_to_file(self, path, timeout=5.0):
+        data = self.capture_jpeg(timeout)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def capture_burst(self, count, timeout=5.0):
+        """JPEG bytes of `count` successive frames"""
+        return [self.capture_jpeg(timeout) for _ in range(count)]
+
+    def preview_frame(self, last_seq, size=PREVIEW_SIZE, timeout=1.0):
+        """Wait for a frame newer than last_seq; returns (seq, RGB image at most size)
+
+        Decoding happens in the calling thread, so call this off the Tk loop.
+        """
+        raise NotImplementedError
+
+
+class LibcameraStreamBackend(CameraBackend):
+    """Runs one long-lived libcamera-vid producing MJPEG on stdout
+
+    The sensor, AE and AWB stay settled between shots; a capture just waits
+    for the next complete JPEG frame from the running stream instead of
+    starting libcamera-jpeg from cold.
+    """
+    name = "libcamera"
+
+    def __init__(self, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT,
+                 framerate=10, quality=93, preview=False):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.framerate = framerate
+        self.quality = quality
+        self.preview = preview
+
+        self._frame_ready = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+
+        # Restarts libcamera-vid if it crashes; a new reader follows each launch
+        self.supervisor = ProcessSupervisor(
+            "libcamera-vid",
+            self._command,
+            on_start=self._attach_reader,
+            metrics=self.metrics,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+
+    def _command(self):
+        cmd = [
+            "libcamera-vid",
+            "-t", "0",
+            "--codec", "mjpeg",
+            "-q", str(self.quality),
+            "--width", str(self.width),
+            "--height", str(self.height),
+            "--framerate", str(self.framerate),
+            "-o", "-"
+        ]
+        if self.sensor_mode:
+            cmd += ["--mode", self.sensor_mode]
+        cmd.append("--qt-preview" if self.preview else "--nopreview")
+        return cmd
+
+    def start(self):
+        self.supervisor.start()
+        if self.supervisor.failed:
+            raise CameraError("Could not start libcamera-vid")
+
+    def _attach_reader(self, process):
+        threading.Thread(
+            target=self._read_frames, args=(process.stdout,), daemon=True
+        ).start()
+
+    def _read_frames(self, stream):
+        """Split the MJPEG byte stream into frames, keeping only the newest"""
+        first = True
+        buffer = bytearray()
+        search_from = 0
+        while True:
+            chunk = stream.read(65536)
+            if not chunk:
+                break
+            buffer += chunk
+
+            while True:
+                start = buffer.find(JPEG_SOI)
+                if start < 0:
+                    buffer.clear()
+                    search_from = 0
+                    break
+                end = buffer.find(JPEG_EOI, max(start + 2, search_from))
+                if end < 0:
+                    # Don't rescan bytes we've already searched
+                    search_from = max(start + 2, len(buffer) - 1)
+                    if start:
+                        del buffer[:start]
+                        search_from -= start
+                    break
+
+                frame = bytes(buffer[start:end + 2])
+                del buffer[:end + 2]
+                search_from = 0
+                if first:
+                    first = False
+                    self.supervisor.mark_ready()
+                with self._frame_ready:
+                    self._frame = frame
+                    self._frame_seq += 1
+                    self._frame_ready.notify_all()
+
+        with self._frame_ready:
+            self._frame_ready.notify_all()
+
+    def is_running(self):
+        return self.supervisor.is_running()
+
+    def capture_jpeg(self, timeout=5.0):
+        if not self.is_running():
+            raise CameraError("Camera stream is not running")
+
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            # Wait for a frame exposed after the request, not a stale one
+            wanted = self._frame_seq + 1
+            while self._frame_seq < wanted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_running():
+                    raise CameraError("Timed out waiting for a camera frame")
+                self._frame_ready.wait(remaining)
+            return self._frame
+
+    def capture_burst(self, count, timeout=5.0):
+        if not self.is_running():
+            raise CameraError("Camera stream is not running")
+
+        frames = []
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            seq = self._frame_seq
+            while len(frames) < count:
+                # Take each new frame as the reader publishes it
+                while self._frame_seq <= seq:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.is_running():
+                        raise CameraError("Timed out waiting for a camera frame")
+                    self._frame_ready.wait(remaining)
+                seq = self._frame_seq
+                frames.append(self._frame)
+        return frames
+
+    def preview_frame(self, last_seq, size=PREVIEW_SIZE, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        with self._frame_ready:
+            # Frames that arrived while we were busy are skipped, not queued
+            while self._frame_seq <= last_seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_running():
+                    return last_seq, None
+                self._frame_ready.wait(remaining)
+            seq, data = self._frame_seq, self._frame
+
+        image = Image.open(io.BytesIO(data))
+        # Let libjpeg do the downscale with DCT scaling (1/2, 1/4, 1/8)
+        image.draft('RGB', size)
+        image = image.convert('RGB')
+        image.thumbnail(size, Image.Resampling.BILINEAR)
+        return seq, image
+
+    def stop(self):
+        self.supervisor.stop()
+
+
+class Picamera2Backend(CameraBackend):
+    """Keeps a Picamera2 pipeline running and encodes stills on demand"""
+    name = "picamera2"
+
+    def __init__(self, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT, quality=93):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.camera = None
+        self._preview_seq = 0
+
+    def start(self):
+        if self.camera is not None:
+            return
+        try:
+            self.camera = Picamera2()
+            # The low-res YUV stream feeds the in-app preview
+            sensor = {}
+            if self.sensor_mode:
+                mode_width, mode_height = self.sensor_mode.split(':')[:2]
+                sensor = {'output_size': (int(mode_width), int(mode_height))}
+            config = self.camera.create_still_configuration(
+                main={'size': (self.width, self.height)},
+                lores={'size': PREVIEW_SIZE, 'format': 'YUV420'},
+                sensor=sensor
+            )
+            self.camera.configure(config)
+            self.camera.options['quality'] = self.quality
+            self.camera.start()
+        except Exception as e:
+            self.camera = None
+            raise CameraError(f"Could not start Picamera2: {e}")
+
+    def is_running(self):
+        return self.camera is not None
+
+    def capture_jpeg(self, timeout=5.0):
+        if self.camera is None:
+            raise CameraError("Camera is not running")
+        output = io.BytesIO()
+        # Wait on the request ourselves so a hung pipeline can't block forever
+        job = self.camera.capture_file(output, format='jpeg', wait=False)
+        try:
+            self.camera.wait(job, timeout=timeout)
+        except TimeoutError:
+            raise CameraError("Timed out waiting for a camera frame")
+        return output.getvalue()
+
+    def preview_frame(self, last_seq, size=PREVIEW_SIZE, timeout=1.0):
+        if self.camera is None:
+            return last_seq, None
+        # Waits for the next frame, so we never see the same one twice
+        job = self.camera.capture_array('lores', wait=False)
+        try:
+            yuv = self.camera.wait(job, timeout=timeout)
+        except TimeoutError:
+            raise CameraError("Timed out waiting for a preview frame")
+        image = Image.fromarray(cv2.cvtColor(yuv, cv2.COLOR_YUV420p2RGB))
+        if image.width > size[0] or image.height > size[1]:
+            image.thumbnail(size, Image.Resampling.BILINEAR)
+        self._preview_seq += 1
+        return self._preview_seq, image
+
+    def stop(self):
+        if self.camera is not None:
+            self.camera.stop()
+            self.camera.close()
+            self.camera = None
+
+
+class SimulatedCameraBackend(CameraBackend):
+    """Replays JPEG files from a directory as if they came off the sensor
+
+    Used on dev machines and for benchmarks. Frames are served in order at
+    `framerate`, and captures wait `latency_ms` on top of that to stand in
+    for the real pipeline. With no usable directory a numbered test pattern
+    is generated instead.
+    """
+    name = "sim"
+
+    def __init__(self, directory=None, latency_ms=0, startup_ms=0,
+                 framerate=10, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT):
+        super().__init__()
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self.startup_ms = startup_ms
+        self.framerate = framerate
+        self.width = width
+        self.height = height
+
+        self.frames = []
+        self.running = False
+        self._index = 0
+        self._seq = 0
+
+    def _load_frames(self):
+        frames = []
+        if self.directory and os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.lower().endswith(('.jpg', '.jpeg')):
+                    with open(os.path.join(self.directory, name), 'rb') as f:
+                        frames.append(f.read())
+        if not frames:
+            frames = [self._test_pattern(i) for i in range(4)]
+        return frames
+
+    def _test_pattern(self, number):
+        image = Image.new('RGB', (self.width, self.height), (40 + number * 40, 90, 160))
+        draw = ImageDraw.Draw(image)
+        for x in range(0, self.width, 96):
+            draw.line([(x, 0), (x, self.height)], fill="white", width=3)
+        draw.text((40, 40), f"SIMULATED FRAME {number}", fill="white")
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return output.getvalue()
+
+    def start(self):
+        if self.running:
+            return
+        time.sleep(self.startup_ms / 1000)
+        self.frames = self._load_frames()
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def is_running(self):
+        return self.running
+
+    def _next_frame(self):
+        time.sleep(1 / self.framerate)
+        frame = self.frames[self._index % len(self.frames)]
+        self._index += 1
+        self._seq += 1
+        return frame
+
+    def capture_jpeg(self, timeout=5.0):
+        if not self.running:
+            raise CameraError("Simulated camera is not running")
+        time.sleep(self.latency_ms / 1000)
+        return self._next_frame()
+
+    def preview_frame(self, last_seq, size=PREVIEW_SIZE, timeout=1.0):
+        if not self.running:
+            return last_seq, None
+        image = Image.open(io.BytesIO(self._next_frame()))
+        image.draft('RGB', size)
+        image = image.convert('RGB')
+        image.thumbnail(size, Image.Resampling.BILINEAR)
+        return self._seq, image
+
+
+def create_backend(**kwargs):
+    """Backend named by FLASHCARD_CAMERA, or the best available one"""
+    choice = os.environ.get(CAMERA_BACKEND_ENV, "").lower()
+    if choice == "sim":
+        return SimulatedCameraBackend(
+            directory=os.environ.get(SIM_DIR_ENV),
+            latency_ms=float(os.environ.get(SIM_LATENCY_ENV, 0)),
+            **kwargs
+        )
+    if choice == "libcamera":
+        return LibcameraStreamBackend(**kwargs)
+    if choice == "picamera2" or (not choice and Picamera2 is not None):
+        if Picamera2 is None:
+            raise CameraError("picamera2 is not installed")
+        return Picamera2Backend(**kwargs)
+    return LibcameraStreamBackend(**kwargs)
+
+
+class CameraService:
+    """Shares one streaming backend between every screen that needs it
+
+    Screens call acquire() when they appear and release() when they go
+    away; the sensor is stopped once nobody holds it.
+    """
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, preview=False):
+        """Hold the camera; preview=True asks for the backend's own preview window"""
+        start = time.perf_counter()
+        with self._lock:
+            self._users += 1
+            if getattr(self.backend, 'preview', preview) != preview:
+                self.backend.stop()
+                self.backend.preview = preview
+            if not self.backend.is_running():
+                try:
+                    self.backend.start()
+                except CameraError:
+                    self._users -= 1
+                    raise
+        self.metrics.record('acquire', (time.perf_counter() - start) * 1000)
+
+    def release(self):
+        start = time.perf_counter()
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users:
+                return
+            self.backend.stop()
+        self.metrics.record('release', (time.perf_counter() - start) * 1000)
+        logging.info(f"Camera metrics: {self.metrics.summary()}")
+
+    @property
+    def metrics(self):
+        return self.backend.metrics
+
+    def use_profile(self, name):
+        """Select one of CAPTURE_PROFILES for subsequent captures"""
+        with self._lock:
+            self.backend.configure(CAPTURE_PROFILES[name])
+
+    def _ensure_running(self):
+        with self._lock:
+            if not self.backend.is_running():
+                # The pipeline gave up or was never started; try once more
+                self.backend.start()
+
+    def capture_jpeg(self, timeout=5.0):
+        self._ensure_running()
+        start = time.perf_counter()
+        data = self.backend.capture_jpeg(timeout)
+        self.metrics.record('capture', (time.perf_counter() - start) * 1000)
+        return data
+
+    def capture_burst(self, count, timeout=5.0):
+        self._ensure_running()
+        start = time.perf_counter()
+        frames = self.backend.capture_burst(count, timeout)
+        self.metrics.record('burst', (time.perf_counter() - start) * 1000)
+        return frames
+
+    def capture_to_file(self, path, timeout=5.0):
+        data = self.capture_jpeg(timeout)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def preview_frame(self, last_seq, size=PREVIEW_SIZE, timeout=1.0):
+        if not self.backend.is_running():
+            return last_seq, None
+        return self.backend.preview_frame(last_seq, size, timeout)
+
+    def shutdown(self):
+        with self._lock:
+            self._users = 0
+            self.backend.stop()
+
+
+class AsyncCapture:
+    """Runs a capture off the Tk loop and reports each state change on it
+
+    capture() runs on a worker thread, then process(result) if given (for
+    decoding/resizing the shot). on_state(state, payload) is called on the
+    Tk loop for every transition; payload is the processed result for READY
+    and the exception for FAILED. If preview(result) is given, its return
+    value is the PROCESSING payload, so something can be shown while
+    process() is still running.
+    """
+    def __init__(self, widget, on_state, poll_ms=30):
+        self.widget = widget
+        self.on_state = on_state
+        self.poll_ms = poll_ms
+        self.state = IDLE
+        self._events = queue.Queue()
+
+    @property
+    def busy(self):
+        return self.state in (CAPTURING, PROCESSING)
+
+    def start(self, capture, process=None, preview=None):
+        """Begin a capture; returns False if one is already in flight"""
+        if self.busy:
+            return False
+        self._set_state(CAPTURING, None)
+        threading.Thread(
+            target=self._run, args=(capture, process, preview), daemon=True
+        ).start()
+        self.widget.after(self.poll_ms, self._poll)
+        return True
+
+    def reset(self):
+        if not self.busy:
+            self._set_state(IDLE, None)
+
+    def _run(self, capture, process, preview):
+        try:
+            result = capture()
+            if process is not None:
+                early = None
+                if preview is not None:
+                    try:
+                        early = preview(result)
+                    except Exception as e:
+                        logging.warning(f"Capture preview failed: {e}")
+                self._events.put((PROCESSING, early))
+                result = process(result)
+            self._events.put((READY, result))
+        except Exception as e:
+            logging.error(f"Capture failed: {e}")
+            self._events.put((FAILED, e))
+
+    def _set_state(self, state, payload):
+        self.state = state
+        self.on_state(state, payload)
+
+    def _poll(self):
+        if not self.widget.winfo_exists():
+            # Screen went away mid-capture; the result is dropped
+            return
+        try:
+            while True:
+                state, payload = self._events.get_nowait()
+                self._set_state(state, payload)
+        except queue.Empty:
+            pass
+        if self.busy:
+            self.widget.after(self.poll_ms, self._poll)
+
+
+_service = None
+
+
+def get_camera_service():
+    """Return the process-wide camera service (backend chosen by create_backend)"""
+    global _service
+    if _service is None:
+        _service = CameraService()
+        atexit.register(_service.shutdown)
+    return _service
+
+
+def benchmark(count=10):
+    """Time captures, bursts and preview frames on the configured backend"""
+    service = CameraService()
+    print(f"Backend: {service.backend.name}")
+
+    start = time.perf_counter()
+    service.acquire()
+    print(f"{'startup':<16} {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    def run(name, action):
+        times = []
+        for _ in range(count):
+            start = time.perf_counter()
+            action()
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        print(f"{name:<16} {sum(times) / len(times):8.1f} ms mean   "
+              f"{times[len(times) // 2]:8.1f} ms median   {times[-1]:8.1f} ms max")
+
+    run("capture", service.capture_jpeg)
+    run("burst x3", lambda: service.capture_burst(3))
+    seq = [0]
+
+    def preview():
+        seq[0], _ = service.preview_frame(seq[0])
+    run("preview frame", preview)
+
+    start = time.perf_counter()
+    service.release()
+    print(f"{'teardown':<16} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    print(f"Metrics: {service.metrics.summary()}")
+
+
+if __name__ == "__main__":
+    benchmark()
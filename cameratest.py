@@ -1,9 +1,10 @@
 import tkinter as tk
 from tkinter import ttk
-import subprocess
 import os
 from datetime import datetime
-from PIL import Image, ImageTk
+from PIL import ImageTk
+from camera_service import CameraError, get_camera_service
+from image_loading import load_scaled
 
 class CaptureReviewComponent:
     def __init__(self, parent, proceed_callback=None):
@@ -15,6 +16,15 @@ class CaptureReviewComponent:
         
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        
+        # Run with FLASHCARD_CAMERA=sim to replay images instead of the camera
+        self.camera = get_camera_service()
+        self.camera_held = False
+        try:
+            self.camera.acquire()
+            self.camera_held = True
+        except CameraError as e:
+            print(f"Error starting camera: {e}")
             
         self._create_ui()
         
@@ -77,22 +87,8 @@ class CaptureReviewComponent:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = os.path.join(self.output_dir, f"image_{timestamp}.jpg")
             
-            # Capture image
-            cmd = [
-                "libcamera-jpeg",
-                "--qt",
-                "-o", filename,
-                "--width", "2304",
-                "--height", "1296",
-                "--nopreview"
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            # Capture image from the running stream
+            self.camera.capture_to_file(filename)
             
             # Display the captured image
             self.display_image(filename)
@@ -113,23 +109,12 @@ class CaptureReviewComponent:
     def display_image(self, image_path):
         """Display an image in the UI"""
         try:
-            # Open and resize image to fit display
-            image = Image.open(image_path)
-            
             # Calculate size to maintain aspect ratio
             display_width = min(800, self.parent.winfo_width() - 100)
             display_height = min(600, self.parent.winfo_height() - 200)
             
-            # Calculate scaling factor
-            width_ratio = display_width / image.width
-            height_ratio = display_height / image.height
-            scale_factor = min(width_ratio, height_ratio)
-            
-            new_width = int(image.width * scale_factor)
-            new_height = int(image.height * scale_factor)
-            
-            # Resize image
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # Decode at reduced scale and resize to fit display
+            image = load_scaled(image_path, (display_width, display_height))
             
             # Convert to PhotoImage
             photo = ImageTk.PhotoImage(image)
@@ -154,6 +139,9 @@ class CaptureReviewComponent:
         self.frame.grid(**kwargs)
         
     def destroy(self):
+        if self.camera_held:
+            self.camera_held = False
+            self.camera.release()
         self.frame.destroy()
 
 # Test code
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from album_index import get_album_index
+from image_derivatives import display_source
+from image_hash import dhash
+from image_pyramid import ImagePyramid
+from thumbnail_cache import get_thumbnail_cache
+
+
+# Job queue lives next to the album index
+JOBS_NAME = ".album_jobs.sqlite3"
+MAX_ATTEMPTS = 3
+# Background work waits until the UI has been quiet this long
+IDLE_S = 0.5
+WORKER_NICE = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    sizes TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+"""
+
+_last_activity = 0.0
+
+
+def notify_activity():
+    """Called from touch, capture and paging handlers to hold off background work"""
+    global _last_activity
+    _last_activity = time.monotonic()
+
+
+def _lower_priority():
+    # Linux threads have their own nice value
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICE)
+    except (AttributeError, OSError) as e:
+        logging.debug(f"Could not lower derivative worker priority: {e}")
+
+
+class DerivativePipeline:
+    """Work done for each new capture after it is saved
+
+    For every enqueued file: thumbnail cache entries at the sizes the
+    screens will ask for, its metadata in the album index, its
+    perceptual hash and the tile pyramid for the zoom viewer. Jobs are
+    kept in SQLite until they finish, so work cut off by a restart is
+    picked up when the pipeline next starts. The worker runs at a lower
+    nice level and waits for the UI to go idle before each step.
+    """
+    def __init__(self, directory, db_path=None, idle_s=IDLE_S):
+        self.index = get_album_index(directory)
+        self.db_path = db_path or os.path.join(self.index.directory, JOBS_NAME)
+        self.idle_s = idle_s
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+        # Older entries that could not be hashed; not retried this session
+        self._unhashable = set()
+
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, path, sizes):
+        """Queue post-save work for `path`; sizes are thumbnail bounds to prepare"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (path, sizes, queued_at) VALUES (?, ?, ?)",
+                (str(path), json.dumps([list(size) for size in sizes]), time.time())
+            )
+        self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE attempts < ?", (MAX_ATTEMPTS,)
+            ).fetchone()[0]
+
+    def _next(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT path, sizes, queued_at FROM jobs WHERE attempts < ? "
+                "ORDER BY queued_at LIMIT 1",
+                (MAX_ATTEMPTS,)
+            ).fetchone()
+
+    def _wait_for_idle(self):
+        while True:
+            quiet = time.monotonic() - _last_activity
+            if quiet >= self.idle_s:
+                return
+            time.sleep(self.idle_s - quiet)
+
+    def _run(self):
+        _lower_priority()
+        while True:
+            job = self._next()
+            if job is None:
+                # Nothing new queued; catch up on cards saved before hashing
+                if not self._backfill_hash():
+                    self._wake.wait()
+                    self._wake.clear()
+                continue
+
+            path, sizes, queued_at = job
+            start = time.perf_counter()
+            try:
+                self._process(path, [tuple(size) for size in json.loads(sizes)])
+            except Exception as e:
+                logging.warning(f"Derivative job for {path} failed: {e}")
+                with self._lock, self._db:
+                    self._db.execute(
+                        "UPDATE jobs SET attempts = attempts + 1, error = ? WHERE path = ?",
+                        (str(e), path)
+                    )
+                time.sleep(1)
+                continue
+
+            with self._lock, self._db:
+                # Unless it was queued again while we worked
+                self._db.execute(
+                    "DELETE FROM jobs WHERE path = ? AND queued_at = ?", (path, queued_at)
+                )
+            logging.info(f"Derivatives for {path} done in "
+                         f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def _backfill_hash(self):
+        """Hash one indexed entry that has no hash yet; False if none are left"""
+        names = [name for name in self.index.unhashed(limit=len(self._unhashable) + 1)
+                 if name not in self._unhashable]
+        if not names:
+            return False
+        self._wait_for_idle()
+        path = os.path.join(self.index.directory, names[0])
+        try:
+            self.index.set_hash(names[0], dhash(display_source(path)))
+        except Exception as e:
+            logging.warning(f"Could not hash {path}: {e}")
+            self._unhashable.add(names[0])
+        return True
+
+    def _process(self, path, sizes):
+        if not os.path.exists(path):
+            # Renamed or deleted since; the watcher keeps the index right
+            return
+        source = display_source(path)
+
+        cache = get_thumbnail_cache()
+        for size in sizes:
+            self._wait_for_idle()
+            cache.cache_path(source, size)
+
+        self._wait_for_idle()
+        self.index.add(path)
+        self._wait_for_idle()
+        self.index.set_hash(os.path.basename(path), dhash(source))
+
+        # Zoom tiles come from the full-size original
+        self._wait_for_idle()
+        ImagePyramid(path).build()
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_derivative_pipeline(directory):
+    """Return the running pipeline for an album directory, starting it if needed"""
+    key = os.path.abspath(str(directory))
+    with _pipelines_lock:
+        if key not in _pipelines:
+            _pipelines[key] = DerivativePipeline(directory)
+        return _pipelines[key]
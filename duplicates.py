@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import time
+
+from album_index import get_album_index
+from image_derivatives import display_source
+from image_hash import dhash, hamming
+
+
+# dHash bits (of 64) two pictures of the same card may differ by
+DUPLICATE_DISTANCE = 6
+
+
+class BKTree:
+    """Burkhard-Keller tree over hashes, for "everything within r bits" queries
+
+    Each child hangs off its parent at its Hamming distance from it, so by
+    the triangle inequality a search only descends into children whose
+    edge is within r of the query's distance to the node.
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = (value, [item], {})
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, [item], {})
+                return
+            node = child
+
+    def search(self, value, radius):
+        """[(distance, item)] for every item within `radius`, nearest first"""
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                results.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        results.sort()
+        return results
+
+
+def _hash_missing(index):
+    """Hash entries the derivative pipeline hasn't got to, for a full scan"""
+    for name in index.unhashed():
+        path = os.path.join(index.directory, name)
+        try:
+            index.set_hash(name, dhash(display_source(path)))
+        except Exception as e:
+            logging.warning(f"Could not hash {path}: {e}")
+
+
+class AlbumHashTree:
+    """BK-tree over an album's stored hashes, kept current as they are written
+
+    Built once from the index, then grown as the derivative pipeline
+    stores hashes. A tree can't drop nodes, so results are checked
+    against the latest hash of each name and entries no longer in the
+    index are skipped.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.tree = BKTree()
+        self._latest = {}
+        self._lock = threading.Lock()
+        index.subscribe_hashes(self._add)
+        for name, value in index.hashes():
+            self._add(name, value)
+
+    def _add(self, name, value):
+        with self._lock:
+            if self._latest.get(name) != value:
+                self._latest[name] = value
+                self.tree.add(value, (name, value))
+
+    def search(self, value, radius):
+        """[(distance, name)] within `radius`, nearest first"""
+        with self._lock:
+            found = [(distance, name) for distance, (name, stored) in self.tree.search(value, radius)
+                     if self._latest.get(name) == stored]
+        return [(distance, name) for distance, name in found
+                if self.index.get(name) is not None]
+
+
+_trees = {}
+_trees_lock = threading.Lock()
+
+
+def get_album_hash_tree(directory):
+    """Return the shared hash tree for an album directory"""
+    index = get_album_index(directory)
+    with _trees_lock:
+        key = os.path.abspath(index.directory)
+        if key not in _trees:
+            _trees[key] = AlbumHashTree(index)
+        return _trees[key]
+
+
+def find_similar(directory, image, radius=DUPLICATE_DISTANCE):
+    """Album entries that look like `image` (path, JPEG bytes or PIL image)
+
+    Only entries already hashed are considered; the derivative pipeline
+    hashes new captures and, when idle, older cards.
+    """
+    return get_album_hash_tree(directory).search(dhash(image), radius)
+
+
+def find_duplicates(directory, radius=DUPLICATE_DISTANCE):
+    """Groups of album entries within `radius` of each other, largest first"""
+    index = get_album_index(directory)
+    _hash_missing(index)
+    hashes = index.hashes()
+    tree = BKTree()
+    for name, value in hashes:
+        tree.add(value, name)
+
+    # Union-find over every near pair
+    parent = {name: name for name, _ in hashes}
+
+    def root(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for name, value in hashes:
+        for _, other in tree.search(value, radius):
+            parent[root(other)] = root(name)
+
+    groups = {}
+    for name, _ in hashes:
+        groups.setdefault(root(name), []).append(name)
+    return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=len, reverse=True)
+
+
+def main(argv):
+    """python duplicates.py [directory] [radius]"""
+    directory = argv[1] if len(argv) > 1 else "captured_images"
+    radius = int(argv[2]) if len(argv) > 2 else DUPLICATE_DISTANCE
+    start = time.perf_counter()
+    groups = find_duplicates(directory, radius)
+    elapsed = (time.perf_counter() - start) * 1000
+    for group in groups:
+        print("  ".join(group))
+    print(f"{len(groups)} groups of near-duplicates in {get_album_index(directory).count()} "
+          f"images ({elapsed:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main(sys.argv))
@@ -1,18 +1,39 @@
 import tkinter as tk
 from tkinter import ttk
 import sys
-import subprocess
 from datetime import datetime
+import io
 import os
-import cv2
 from PIL import Image, ImageTk
 import threading
+import time
 import queue
-import numpy as np
-import cv2
 import pytesseract
 import logging
 from PIL import ImageFont, Image, ImageDraw
+import ink_latency
+from album_index import get_album_index
+from album_watcher import get_album_watcher
+from derivative_pipeline import get_derivative_pipeline, notify_activity
+from duplicates import find_similar
+from handwriting_grid import HandwritingGrid
+from image_derivatives import make_display_derivative, save_capture
+from image_loading import load_scaled, quick_preview
+from image_quality import DEFAULT_SCORE_SIZE, assess, pick_sharpest
+from ink_raster import DEFAULT_SUPERSAMPLE, InkRasterizer
+from camera_preview import LivePreview
+from camera_service import (
+    CAPTURING, DEFAULT_PROFILE, FAILED, IDLE, PROCESSING, READY, AsyncCapture,
+    CameraError, get_camera_service
+)
+from photo_cache import get_photo_cache
+from thumbnail_prefetch import ThumbnailPrefetcher
+from tiled_viewer import TiledImageView
+from virtual_list import PagedSource
+from multitouch import (
+    POINTER_CONTACT, ContactTracker, EvdevTouchSource, RegionRecognitionQueue
+)
+from ink_segmentation import StrokeRecorder, recognize_character, recognize_line
 
 
 #Fix buttons sizes
@@ -141,7 +162,9 @@ class CameraPreview(Component):
         self.preview_active = False
         self.output_dir = "captured_images"
         self.callback = callback
-        self.preview_process = None
+        self.camera = get_camera_service()
+        self.live_preview = None
+        self.capture = AsyncCapture(self.frame, self._on_capture_state)
         
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
@@ -149,6 +172,14 @@ class CameraPreview(Component):
         self._create_ui()
         
     def _create_ui(self):
+        # Live camera image, painted in-window
+        self.preview_label = ttk.Label(self.frame)
+        self.preview_label.pack(padx=20, pady=(20, 0))
+        
+        # Preview rate / decode time readout
+        self.stats_label = ttk.Label(self.frame, font=('Arial', 9))
+        self.stats_label.pack()
+        
         # Create control frame for button
         self.control_frame = ttk.Frame(self.frame)
         self.control_frame.pack(pady=20)
@@ -166,81 +197,92 @@ class CameraPreview(Component):
         self.frame.after(100, self.start_preview)
     
     def start_preview(self):
-        """Start the preview window using libcamera-hello"""
-        if self.preview_process is None:
+        """Start the camera stream and paint it into the window"""
+        if not self.preview_active:
             try:
+                self.camera.acquire()
                 self.preview_active = True
-                self.preview_process = subprocess.Popen([
-                    "libcamera-hello",
-                    "--qt",  # Essential qt flag
-                    "--width", "2304",
-                    "--height", "1296"
-                ])
-            except subprocess.CalledProcessError as e:
+            except CameraError as e:
                 print(f"Error starting preview: {e}")
+                return
+            self.live_preview = LivePreview(self.preview_label, self.camera)
+            self.live_preview.start()
+            self._update_stats()
+    
+    def _update_stats(self):
+        if not self.preview_active:
+            return
+        stats = self.live_preview.stats()
+        self.stats_label.config(
+            text=f"{stats['fps']:.1f} fps   decode {stats['decode_ms']:.1f} ms   "
+                 f"dropped {stats['dropped']}"
+        )
+        self.frame.after(1000, self._update_stats)
     
     def stop_preview(self):
-        """Stop the preview window"""
-        if self.preview_process:
+        """Stop painting and let go of the camera stream"""
+        if self.preview_active:
             self.preview_active = False
-            self.preview_process.terminate()
-            try:
-                self.preview_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                self.preview_process.kill()
-            self.preview_process = None
+            self.live_preview.stop()
+            self.live_preview = None
+            self.camera.release()
     
     def capture_image(self):
-        """Capture an image following the exact capture.py implementation"""
-        # Temporarily stop the preview
-        self.stop_preview()
-        
+        """Grab a still from the running stream without blocking the preview"""
         # Generate filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{self.output_dir}/image_{timestamp}.jpg"
-        
-        try:
-            # Using exact command from capture.py
-            cmd = [
-                "libcamera-jpeg",
-                "-o", filename,
-                "--width", "2304",
-                "--height", "1296",
-                "--qt",  # Essential qt flag
-                "--nopreview"  # Since we don't need preview for capture
-            ]
-            
-            subprocess.run(cmd, check=True)
-            print(f"Image captured successfully: {filename}")
-            
+        self.capture.start(lambda: self.camera.capture_to_file(filename))
+    
+    def _on_capture_state(self, state, payload):
+        self.capture_btn.set_enabled(not self.capture.busy)
+        if state == READY:
+            print(f"Image captured successfully: {payload}")
             # Call the callback with the captured image path
             if self.callback:
-                self.callback(filename)
-            
-            # Restart the preview
-            self.start_preview()
-            return filename
-            
-        except subprocess.CalledProcessError as e:
-            print(f"Error capturing image: {e}")
-            # Restart the preview even if capture failed
-            self.start_preview()
-            return None
+                self.callback(payload)
+        elif state == FAILED:
+            print(f"Error capturing image: {payload}")
     
     def destroy(self):
         """Clean up resources when component is destroyed"""
         self.stop_preview()
         super().destroy()
 class ImageList(Component):
-    """Component to display captured images as a scrollable list"""
-    def __init__(self, parent, image_dir="captured_images", **kwargs):
+    """Component to display captured images as a paged thumbnail grid"""
+    def __init__(self, parent, image_dir="captured_images", prefetch_depth=1, **kwargs):
         super().__init__(parent, **kwargs)
         self.image_dir = image_dir
+        self.index = get_album_index(image_dir)
         self.current_page = 0
-        self.images_per_page = 4
+        # Pages either side of the visible one decoded ahead of time
+        self.prefetch_depth = prefetch_depth
+        # Names on the page being shown; None while viewing one image
+        self.shown_names = None
+        self.image_view = None
         self._create_ui()
+
+        self.prefetcher = ThumbnailPrefetcher(
+            (self.thumb_size, self.thumb_size),
+            keep=self.images_per_page * (2 * prefetch_depth + 2)
+        )
+        # Newest names first, one grid page per fetch
+        self.source = PagedSource(
+            lambda offset, limit: self.index.page(offset, limit, descending=True),
+            self.index.count,
+            page_size=self.images_per_page,
+            keep_pages=2 * prefetch_depth + 2
+        )
         self.refresh_images()
 
+        # Files added or renamed behind our back (e.g. over SSH) arrive
+        # from the watcher thread and are picked up on the Tk loop
+        self.album_changes = queue.Queue()
+        self.watcher = get_album_watcher(image_dir)
+        self.watcher.subscribe(self.album_changes.put)
+        self._poll_after_id = None
+        self._poll_background()
+
     def _create_ui(self):
         # Navigation buttons container
         nav_frame = ttk.Frame(self.frame)
@@ -281,70 +323,181 @@ class ImageList(Component):
         )
         self.down_button.pack(pady=(10, 0))
 
-        # Images container
+        # Images container: the grid, or the single image viewer
         self.images_frame = ttk.Frame(self.frame)
         self.images_frame.pack(side='left', fill='both', expand=True)
-
-    def refresh_images(self):
-        if os.path.exists(self.image_dir):
-            self.image_files = sorted(
-                [f for f in os.listdir(self.image_dir) if f.endswith('.jpg')],
-                reverse=True
+        self.grid_frame = ttk.Frame(self.images_frame)
+        self.viewer_frame = ttk.Frame(self.images_frame)
+
+        # Size the grid to the screen
+        self.thumb_size = self.thumbnail_size(screen_width, screen_height)
+        self.columns = max(1, int(screen_width * 0.8) // (self.thumb_size + 20))
+        self.rows = max(1, int(screen_height * 0.65) // (self.thumb_size + 50))
+        self.images_per_page = self.columns * self.rows
+
+        # Cells are created once and reused for every page
+        self.placeholder = ImageTk.PhotoImage(
+            Image.new('RGB', (self.thumb_size, self.thumb_size), '#dddddd')
+        )
+        self.cells = []
+        self.cell_paths = []
+        for i in range(self.images_per_page):
+            cell = ttk.Label(
+                self.grid_frame,
+                image=self.placeholder,
+                compound='top',
+                anchor='center',
+                wraplength=self.thumb_size,
+                font=('Arial', max(8, int(screen_height * 0.015)))
             )
-            self.total_pages = (len(self.image_files) + self.images_per_page - 1) // self.images_per_page
-            self._show_current_page()
-        else:
-            self.image_files = []
-            self.total_pages = 1
-            self._show_current_page()
+            cell.bind('<Button-1>', lambda e, i=i: self._on_cell_click(i))
+            cell.grid(row=i // self.columns, column=i % self.columns, padx=10, pady=5)
+            self.cells.append(cell)
+            self.cell_paths.append(None)
+
+    @staticmethod
+    def thumbnail_size(screen_width, screen_height):
+        return int(min(screen_width * 0.18, screen_height * 0.22))
+
+    def _close_image_view(self):
+        if self.image_view is not None:
+            self.image_view.destroy()
+            self.image_view = None
 
-    def _show_current_page(self):
-        # Clear current images
-        for widget in self.images_frame.winfo_children():
+    def refresh_images(self):
+        self.source.invalidate()
+        self._close_image_view()
+        self.viewer_frame.pack_forget()
+        for widget in self.viewer_frame.winfo_children():
             widget.destroy()
+        self.grid_frame.pack(fill='both', expand=True)
+        self._update_page_count()
+        self._show_current_page()
+
+    def _update_page_count(self):
+        # Only the count here; pages are fetched from the index as needed
+        total = self.source.count()
+        self.total_pages = (total + self.images_per_page - 1) // self.images_per_page
+        self.current_page = min(self.current_page, max(0, self.total_pages - 1))
+
+    def _page_entries(self, page=None):
+        return self.source.page(self.current_page if page is None else page)
+
+    def _poll_background(self):
+        changed = False
+        while True:
+            try:
+                self.album_changes.get_nowait()
+                changed = True
+            except queue.Empty:
+                break
+        if changed:
+            self._on_album_changed()
 
-        # Calculate dimensions
-        button_width = int(self.parent.winfo_screenwidth() * 0.30)  # Reduced from 0.4
-        button_height = int(self.parent.winfo_screenheight() * 0.12)  # Reduced from 0.18
+        # Paint thumbnails that finished decoding
+        while True:
+            try:
+                path = self.prefetcher.ready.get_nowait()
+            except queue.Empty:
+                break
+            if self.shown_names is not None and path in self.cell_paths:
+                self._paint_cell(self.cell_paths.index(path))
 
-        # Get current page images
-        start_idx = self.current_page * self.images_per_page
-        end_idx = start_idx + self.images_per_page
-        current_images = self.image_files[start_idx:end_idx]
+        self._poll_after_id = self.frame.after(40, self._poll_background)
 
-        # Create image buttons
-        for image_file in current_images:
-            image_path = os.path.join(self.image_dir, image_file)
-            btn = RoundedButton(
-                self.images_frame,
-                text=image_file,
-                command=lambda p=image_path: self._view_image(p),
-                width=button_width,
-                height=button_height,
-                bg_color="#4CAF50"
-            )
-            btn.pack(pady=10, padx=30)
+    def _on_album_changed(self):
+        """Rebuild the visible page only if the change touched it"""
+        self.source.invalidate()
+        self._update_page_count()
+        if self.shown_names is None:
+            # Viewing a single image; Back reloads the page anyway
+            return
+        entries = self._page_entries()
+        if [entry.name for entry in entries] != self.shown_names:
+            self._show_current_page(entries)
+        else:
+            self._update_navigation()
 
-        # Update navigation
+    def _show_current_page(self, current_images=None):
+        # Get current page images
+        if current_images is None:
+            current_images = self._page_entries()
+        self.shown_names = [entry.name for entry in current_images]
+        # The previous page's images stay cached but may now be evicted
+        get_photo_cache().release(self)
+
+        # Refill the existing cells; thumbnails not decoded yet show the
+        # placeholder until the prefetcher reports them
+        for i, cell in enumerate(self.cells):
+            if i < len(current_images):
+                self.cell_paths[i] = os.path.join(self.image_dir, current_images[i].name)
+                cell.configure(text=os.path.splitext(current_images[i].name)[0])
+                self._paint_cell(i)
+                cell.grid()
+            else:
+                self.cell_paths[i] = None
+                cell.grid_remove()
+
+        self._update_navigation()
+        self._prefetch_around(current_images)
+
+    def _paint_cell(self, i):
+        path = self.cell_paths[i]
+        try:
+            photo = get_photo_cache().get(
+                path, (self.thumb_size, self.thumb_size), owner=self,
+                loader=lambda: self.prefetcher.get(path)
+            )
+        except OSError:
+            # Deleted; the watcher will redraw the page
+            photo = None
+        if photo is None:
+            photo = self.placeholder
+        self.cells[i].configure(image=photo)
+        self.cells[i].image = photo  # Keep reference
+
+    def _prefetch_around(self, current_images):
+        """Queue the visible page, then pages N+1, N-1, N+2, ... up to the depth"""
+        paths = [os.path.join(self.image_dir, entry.name) for entry in current_images]
+        for distance in range(1, self.prefetch_depth + 1):
+            for page in (self.current_page + distance, self.current_page - distance):
+                if 0 <= page < self.total_pages:
+                    paths += [os.path.join(self.image_dir, entry.name)
+                              for entry in self._page_entries(page)]
+        # Replaces the previous request, dropping pages we moved away from
+        self.prefetcher.request(paths)
+
+    def _on_cell_click(self, i):
+        if self.cell_paths[i] is not None:
+            self._view_image(self.cell_paths[i])
+
+    def _update_navigation(self):
         self.page_indicator.configure(text=f"{self.current_page + 1}/{max(1, self.total_pages)}")
         self.up_button.set_enabled(self.current_page > 0)
         self.down_button.set_enabled(self.current_page < self.total_pages - 1)
 
     def _next_page(self):
+        notify_activity()
         if self.current_page < self.total_pages - 1:
             self.current_page += 1
             self._show_current_page()
 
     def _previous_page(self):
+        notify_activity()
         if self.current_page > 0:
             self.current_page -= 1
             self._show_current_page()
 
     def _view_image(self, image_path):
         """Display the selected image with a simple viewer"""
-        # Clear current display
-        for widget in self.images_frame.winfo_children():
+        # Swap the grid for the viewer
+        self.shown_names = None
+        self.prefetcher.cancel()
+        self.grid_frame.pack_forget()
+        self._close_image_view()
+        for widget in self.viewer_frame.winfo_children():
             widget.destroy()
+        self.viewer_frame.pack(fill='both', expand=True)
             
         try:
             # Get image name from path
@@ -352,39 +505,31 @@ class ImageList(Component):
             
             # Display image name
             name_label = ttk.Label(
-                self.images_frame,
+                self.viewer_frame,
                 text=image_name,
                 font=('Arial', int(self.parent.winfo_screenheight() * 0.03))
             )
             name_label.pack(pady=10)
             
-            # Load and display image
-            image = Image.open(image_path)
-            
             # Calculate size to maintain aspect ratio
             display_width = min(800, self.parent.winfo_width() - 100)
             display_height = min(600, self.parent.winfo_height() - 200)
             
-            # Calculate scaling factor
-            width_ratio = display_width / image.width
-            height_ratio = display_height / image.height
-            scale_factor = min(width_ratio, height_ratio)
-            
-            new_width = int(image.width * scale_factor)
-            new_height = int(image.height * scale_factor)
-            
-            # Resize image
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
+            # Cached fitted copy, shown until the zoom tiles are ready
+            photo = get_photo_cache().get(
+                image_path, (display_width, display_height), owner=self
+            )
             
-            # Display image
-            image_label = ttk.Label(self.images_frame, image=photo)
-            image_label.image = photo  # Keep reference
-            image_label.pack(pady=10)
+            # Zoom and pan, loading only the tiles on screen
+            self.image_view = TiledImageView(
+                self.viewer_frame, image_path, display_width, display_height,
+                placeholder=photo
+            )
+            self.image_view.pack(pady=10)
             
             # Back button
             back_btn = RoundedButton(
-                self.images_frame,
+                self.viewer_frame,
                 text="Back",
                 command=self.refresh_images,
                 width=int(self.parent.winfo_screenwidth() * 0.15),
@@ -395,7 +540,7 @@ class ImageList(Component):
             
         except Exception as e:
             error_label = ttk.Label(
-                self.images_frame,
+                self.viewer_frame,
                 text=f"Error displaying image: {str(e)}",
                 font=('Arial', int(self.parent.winfo_screenheight() * 0.02))
             )
@@ -403,7 +548,7 @@ class ImageList(Component):
             
             # Back button in case of error
             back_btn = RoundedButton(
-                self.images_frame,
+                self.viewer_frame,
                 text="Back",
                 command=self.refresh_images,
                 width=int(self.parent.winfo_screenwidth() * 0.15),
@@ -411,18 +556,61 @@ class ImageList(Component):
                 bg_color="#4CAF50"
             )
             back_btn.pack(pady=20)
-            """Display the selected image in a dialog"""
-            ImageViewerDialog(self.parent, image_path)
+
+    def destroy(self):
+        """Stop listening for album changes and drop pending thumbnail work"""
+        self.watcher.unsubscribe(self.album_changes.put)
+        self.prefetcher.stop()
+        self._close_image_view()
+        get_photo_cache().release(self)
+        logging.debug(f"Photo cache: {get_photo_cache().stats()}")
+        if self._poll_after_id is not None:
+            self.frame.after_cancel(self._poll_after_id)
+        super().destroy()
 
 class CaptureReviewComponent(Component):
-    def __init__(self, parent, final_callback=None, **kwargs):
+    def __init__(self, parent, final_callback=None, burst_length=3,
+                 score_size=DEFAULT_SCORE_SIZE, max_retakes=1,
+                 check_budget_ms=50, profile=DEFAULT_PROFILE, **kwargs):
         super().__init__(parent, **kwargs)
         self.final_callback = final_callback
         self.output_dir = "captured_images"
-        self.current_image_path = None
+        # Each capture grabs this many frames and keeps the sharpest;
+        # score_size is the longest side they are scored at
+        self.burst_length = max(1, burst_length)
+        self.score_size = score_size
+        # Frames failing the blur/exposure check are retaken automatically
+        # up to max_retakes times, then shown with a warning
+        self.max_retakes = max_retakes
+        self.check_budget_ms = check_budget_ms
+        self.quality_report = None
+        # Existing cards the shot under review looks like, as (distance, name)
+        self.duplicates = []
+        # The shot under review: JPEG bytes as captured, and the decoded image.
+        # Nothing is written to disk until a name is confirmed.
+        self.captured_jpeg = None
+        self.captured_image = None
+        # Display-sized JPEG made from the same frame, saved alongside it
+        self.captured_display_jpeg = None
+        # The naming screen, while it is up
+        self.name_input = None
         
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        
+        # Start streaming now so the sensor has settled by the first capture
+        self.camera = get_camera_service()
+        self.camera_held = False
+        try:
+            self.camera.use_profile(profile)
+            self.camera.acquire()
+            self.camera_held = True
+        except CameraError as e:
+            print(f"Error starting camera: {e}")
+        
+        # Buttons and status text follow the capture state
+        self.capture = AsyncCapture(self.frame, self._on_capture_state)
+        self.capture_error = None
             
         self._create_ui()
         
@@ -490,6 +678,8 @@ class CaptureReviewComponent(Component):
             bg_color="#c6eb34"
         )
         self.bypass_button.pack(side=tk.RIGHT, padx=10)
+        
+        self._apply_capture_state()
 
     def bypass_photo(self):
         """Skip the photo-taking process and generate a placeholder image"""
@@ -523,21 +713,25 @@ class CaptureReviewComponent(Component):
             text_position = ((width - text_width) / 2, height / 2 - font_size / 2)
             draw.text(text_position, text, fill='black', font=font)
             
-            # Save the placeholder image
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.output_dir, f"placeholder_{timestamp}.jpg")
-            placeholder.save(filename)
-            
-            # Update current image path
-            self.current_image_path = filename
+            # Keep the placeholder in memory like a real capture
+            buffer = io.BytesIO()
+            placeholder.save(buffer, format='JPEG')
+            self.captured_jpeg = buffer.getvalue()
+            self.captured_image = placeholder
+            self.captured_display_jpeg = None
+            # Nothing was checked; don't carry over the last capture's results
+            self.quality_report = None
+            self.duplicates = []
             
             # Show name input OCR with the placeholder image
             for widget in self.frame.winfo_children():
                 widget.destroy()
             
+            self._close_name_input()
             self.name_input = NameInputOCR(
                 self.frame,
-                image_path=filename,  # Pass the placeholder image path
+                image_path=None,
+                image=placeholder,
                 on_confirm=self._handle_name_confirmation,
                 on_cancel=self._handle_name_cancel
             )
@@ -549,6 +743,7 @@ class CaptureReviewComponent(Component):
             for widget in self.frame.winfo_children():
                 widget.destroy()
             
+            self._close_name_input()
             self.name_input = NameInputOCR(
                 self.frame,
                 image_path=None,
@@ -559,127 +754,197 @@ class CaptureReviewComponent(Component):
 
 
     def capture_image(self):
-        """Capture an image and display it for review"""
-        try:
-            # Update UI
-            self.status_label.config(text="Capturing image...")
-            self.capture_button.set_enabled(False)
-            self.proceed_button.set_enabled(False)
-            self.parent.update()
-            
-            # Generate filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.output_dir, f"image_{timestamp}.jpg")
-            
-            # Capture image
-            cmd = [
-                "libcamera-jpeg",
-                "--qt",
-                "-o", filename,
-                "--width", "2304",
-                "--height", "1296",
-                "--nopreview"
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Display the captured image
-            self.display_image(filename)
-            self.current_image_path = filename
-            
-            # Update UI
-            self.status_label.config(
-                text="Image captured! Review the image and proceed, or capture again."
+        """Start a capture in the background and review it when it's ready"""
+        notify_activity()
+        # Tk calls aren't safe on the worker, so read the display size now
+        bounds = self._display_bounds()
+        self.capture.start(
+            self._capture_checked,
+            lambda result: self._decode_capture(result, bounds),
+            # Shown straight away while the derivative is being made
+            preview=lambda result: quick_preview(result[0], bounds)
+        )
+
+    def _capture_checked(self):
+        """Capture, retaking frames that fail the quality check (worker thread)"""
+        for attempt in range(self.max_retakes + 1):
+            data = self._capture_burst()
+            report = assess(data, self.score_size)
+            if report.elapsed_ms > self.check_budget_ms:
+                logging.warning(
+                    f"Quality check took {report.elapsed_ms:.1f} ms "
+                    f"(budget {self.check_budget_ms} ms)"
+                )
+            logging.debug(
+                f"Quality check in {report.elapsed_ms:.1f} ms: {report.describe()} "
+                f"(sharpness {report.sharpness:.0f}, mean {report.mean:.0f})"
             )
-            self.proceed_button.set_enabled(True)
-            
+            if report.ok:
+                break
+        return data, report
+
+    def _capture_burst(self):
+        """Grab a burst from the stream and keep the sharpest frame (worker thread)"""
+        if self.burst_length == 1:
+            return self.camera.capture_jpeg()
+        
+        start = time.perf_counter()
+        frames = self.camera.capture_burst(self.burst_length)
+        capture_ms = (time.perf_counter() - start) * 1000
+        
+        best, scores, score_ms = pick_sharpest(frames, self.score_size)
+        logging.debug(
+            f"Burst of {len(frames)} in {capture_ms:.0f} ms, scored at "
+            f"{self.score_size}px in {score_ms:.1f} ms; kept frame {best + 1} "
+            f"(sharpness {', '.join(f'{score:.0f}' for score in scores)})"
+        )
+        return frames[best]
+
+    def _decode_capture(self, result, bounds):
+        """Make the display derivative; review and name screens reuse it"""
+        data, report = result
+        image, display_jpeg = make_display_derivative(data)
+        try:
+            # Warn before naming if this card is already in the album
+            duplicates = find_similar(self.output_dir, image)
         except Exception as e:
-            self.status_label.config(text=f"Error capturing image: {str(e)}")
-            print(f"Capture error: {e}")
-        finally:
-            self.capture_button.set_enabled(True)
+            logging.warning(f"Duplicate check failed: {e}")
+            duplicates = []
+        return data, report, display_jpeg, image, duplicates, self._fit_display(image, bounds)
+
+    def _on_capture_state(self, state, payload):
+        if state == PROCESSING and payload is not None:
+            self._show_image(payload)
+        elif state == READY:
+            (self.captured_jpeg, self.quality_report, self.captured_display_jpeg,
+             self.captured_image, self.duplicates, display) = payload
+            self._show_image(display)
+        elif state == FAILED:
+            self.capture_error = payload
+            print(f"Capture error: {payload}")
+        self._apply_capture_state()
+
+    def _apply_capture_state(self):
+        """Set status text and button availability from the capture state"""
+        state = self.capture.state
+        messages = {
+            IDLE: "Take a picture to begin",
+            CAPTURING: "Capturing image...",
+            PROCESSING: "Processing image...",
+            READY: "Image captured! Review the image and proceed, or capture again.",
+            FAILED: f"Error capturing image: {self.capture_error}"
+        }
+        warnings = []
+        if self.quality_report and not self.quality_report.ok:
+            warnings.append(f"Image may be {self.quality_report.describe()}.")
+        if self.duplicates:
+            names = ", ".join(os.path.splitext(name)[0] for _, name in self.duplicates[:2])
+            warnings.append(f"Looks like an existing card: {names}.")
+        if state == READY and warnings:
+            messages[READY] = " ".join(warnings) + " Proceed anyway, or capture again."
+        self.status_label.config(text=messages[state])
+        
+        busy = self.capture.busy
+        self.capture_button.set_enabled(not busy)
+        self.bypass_button.set_enabled(not busy)
+        self.proceed_button.set_enabled(not busy and self.captured_image is not None)
+
+    def _display_bounds(self):
+        return (
+            min(800, self.parent.winfo_width() - 100),
+            min(600, self.parent.winfo_height() - 200)
+        )
 
-    def display_image(self, image_path):
+    def _fit_display(self, image, bounds):
+        """Resize an image to fit the review area (safe off the Tk loop)"""
+        return load_scaled(image, bounds)
+
+    def _show_image(self, image):
+        # Convert to PhotoImage
+        photo = ImageTk.PhotoImage(image)
+        
+        # Update label
+        self.image_label.configure(image=photo)
+        self.image_label.image = photo  # Keep a reference!
+
+    def display_image(self, image):
         """Display an image in the UI"""
         try:
-            # Open and resize image to fit display
-            image = Image.open(image_path)
-            
-            # Calculate size to maintain aspect ratio
-            display_width = min(800, self.parent.winfo_width() - 100)
-            display_height = min(600, self.parent.winfo_height() - 200)
-            
-            # Calculate scaling factor
-            width_ratio = display_width / image.width
-            height_ratio = display_height / image.height
-            scale_factor = min(width_ratio, height_ratio)
-            
-            new_width = int(image.width * scale_factor)
-            new_height = int(image.height * scale_factor)
-            
-            # Resize image
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage
-            photo = ImageTk.PhotoImage(image)
-            
-            # Update label
-            self.image_label.configure(image=photo)
-            self.image_label.image = photo  # Keep a reference!
-            
+            self._show_image(self._fit_display(image, self._display_bounds()))
         except Exception as e:
             self.status_label.config(text=f"Error displaying image: {str(e)}")
             print(f"Display error: {e}")
 
     def proceed(self):
         """Handle proceed button click"""
-        if self.current_image_path:
+        if self.captured_image is not None:
             # Clear current UI
             for widget in self.frame.winfo_children():
                 widget.destroy()
             
             # Show name input OCR
+            self._close_name_input()
             self.name_input = NameInputOCR(
                 self.frame,
-                self.current_image_path,
+                None,
+                image=self.captured_image,
                 on_confirm=self._handle_name_confirmation,
                 on_cancel=self._handle_name_cancel
             )
             self.name_input.pack(fill='both', expand=True)
 
     def _handle_name_confirmation(self, new_name):
-        """Handle the confirmed name from OCR"""
-        try:
-            # Generate new filename
-            file_ext = os.path.splitext(self.current_image_path)[1]
-            new_filename = f"{new_name}{file_ext}"
-            new_path = os.path.join(self.output_dir, new_filename)
-            
-            # Rename file
-            os.rename(self.current_image_path, new_path)
-            
-            # Call final callback with new path
+        """Write the capture to disk under the confirmed name"""
+        if self.captured_jpeg is None:
             if self.final_callback:
-                self.final_callback(new_path)
-                
+                self.final_callback(None)
+            return
+        
+        new_path = os.path.join(self.output_dir, f"{new_name}.jpg")
+        try:
+            self._write_capture(new_path)
         except Exception as e:
             print(f"Error saving file: {e}")  # Just print to console instead of showing messagebox
-            if self.final_callback:
-                self.final_callback(self.current_image_path)  # Still proceed even if rename fails
+            # Still keep the photo under a timestamped name
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            new_path = os.path.join(self.output_dir, f"image_{timestamp}.jpg")
+            try:
+                self._write_capture(new_path)
+            except Exception as e:
+                print(f"Error saving file: {e}")
+                new_path = None
+        
+        # Call final callback with new path
+        if self.final_callback:
+            self.final_callback(new_path)
+
+    def _write_capture(self, path):
+        save_capture(path, self.captured_jpeg, self.captured_display_jpeg)
+        get_album_index(self.output_dir).add(path)
 
 
     def _handle_name_cancel(self):
         """Handle cancellation of name input"""
         # Restore original capture review UI
-        self.name_input.destroy()
+        self._close_name_input()
         self._create_ui()
-        if self.current_image_path:
-            self.display_image(self.current_image_path)
+        if self.captured_image is not None:
+            self.display_image(self.captured_image)
+
+    def destroy(self):
+        """Release the camera stream when leaving the capture screen"""
+        if self.camera_held:
+            self.camera_held = False
+            self.camera.release()
+        self._close_name_input()
+        super().destroy()
+
+    def _close_name_input(self):
+        # Its frame may already be gone with ours, but its touch reader and
+        # recognition worker only stop here
+        if self.name_input is not None:
+            self.name_input.destroy()
+            self.name_input = None
 
 class FlashcardApp:
     """Main application class"""
@@ -700,6 +965,9 @@ class FlashcardApp:
         # Initialize components
         self.current_component = None
         
+        # Picks up derivative work left unfinished by the last run
+        get_derivative_pipeline("captured_images")
+        
         self.show_main_menu()
 
     def clear_container(self):
@@ -795,9 +1063,27 @@ class FlashcardApp:
     def _on_final_image_saved(self, final_image_path):
         """Callback for when an image is saved with its new name"""
         print(f"Image saved with new name: {final_image_path}")
+        if final_image_path:
+            # Thumbnails, index metadata and hash are made in the background
+            get_derivative_pipeline(os.path.dirname(final_image_path)).enqueue(
+                final_image_path, self._derivative_sizes()
+            )
         # Show the image list after successful save
         self.show_image_list()
 
+    def _derivative_sizes(self):
+        """Bounds the album screens will ask the thumbnail cache for"""
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        thumb_size = ImageList.thumbnail_size(screen_width, screen_height)
+        return [
+            (thumb_size, thumb_size),
+            # ImageList viewer and ImageViewerDialog
+            (min(800, self.container.winfo_width() - 100),
+             min(600, self.container.winfo_height() - 200)),
+            (int(screen_width * 0.8), int(screen_height * 0.8))
+        ]
+
     def show_image_list(self):
         self.clear_container()
         self.create_back_button()
@@ -830,7 +1116,8 @@ class FlashcardApp:
         self.current_component.pack(fill='both', expand=True)
 
 class CharacterOCRComponent(Component):
-    def __init__(self, parent, num_rows=2, boxes_per_row=4, debug=True, **kwargs):
+    def __init__(self, parent, num_rows=2, boxes_per_row=4, debug=True,
+                 auto_append=False, supersample=DEFAULT_SUPERSAMPLE, **kwargs):
         """Initialize the OCR component with the parent widget"""
         super().__init__(parent, **kwargs)
         
@@ -849,6 +1136,7 @@ class CharacterOCRComponent(Component):
         self.num_rows = num_rows
         self.boxes_per_row = boxes_per_row
         self.num_regions = num_rows * boxes_per_row
+        self.auto_append = auto_append
         
         # Calculate dimensions based on screen size
         
@@ -863,15 +1151,31 @@ class CharacterOCRComponent(Component):
         # Scale line width based on region size
         self.line_width = max(2, int(self.region_size * 0.03))
         
+        # Recognition buffers are rendered from the recorded strokes
+        self.rasterizer = InkRasterizer(
+            self.line_width / self.region_size,
+            supersample=supersample
+        )
+        
+        # Per-contact drawing state, so several fingers can write in
+        # different boxes at the same time
+        self.contacts = ContactTracker()
+        
         self._create_ui()
         self._setup_regions()
         self._create_controls()
         
-        # Initialize drawing state
-        self.drawing = False
-        self.current_region = None
-        self.last_x = None
-        self.last_y = None
+        # Boxes are recognized in the background as their strokes complete
+        self.recognition_queue = RegionRecognitionQueue(
+            self.frame,
+            self._recognize_region_image
+        )
+        self.touch_source = EvdevTouchSource.start_for(
+            self.canvas,
+            self._contact_down,
+            self._contact_move,
+            self._contact_up
+        )
 
     def _create_ui(self):
         """Create the main UI components"""
@@ -910,39 +1214,23 @@ class CharacterOCRComponent(Component):
         self.canvas.bind("<Button-1>", self._start_drawing)
         self.canvas.bind("<B1-Motion>", self._draw)
         self.canvas.bind("<ButtonRelease-1>", self._stop_drawing)
+        ink_latency.attach(self, self.canvas)
 
     def _setup_regions(self):
         """Create the character regions in a grid layout"""
-        self.regions = []
-        self.region_images = []
-        
-        for row in range(self.num_rows):
-            for col in range(self.boxes_per_row):
-                # Calculate coordinates for this region
-                x1 = col * self.region_size
-                y1 = row * self.region_size
-                x2 = x1 + self.region_size
-                y2 = y1 + self.region_size
-                
-                # Create region rectangle
-                region = self.canvas.create_rectangle(
-                    x1, y1, x2, y2,
-                    outline="#2196F3",  # Material Blue
-                    width=2
-                )
-                
-                # Store region info
-                self.regions.append({
-                    'id': region,
-                    'coords': (x1, y1, x2, y2)
-                })
-                
-                # Create image buffer
-                img = Image.new('L', (self.region_size, self.region_size), 'white')
-                self.region_images.append(img)
-                
-                if self.debug:
-                    logging.debug(f"Created region {row * self.boxes_per_row + col} at ({x1}, {y1}, {x2}, {y2})")
+        # The layout engine owns the boxes so they can be added, removed or
+        # reflowed later without rebuilding the component
+        self.box_layout = HandwritingGrid(
+            self.canvas,
+            self.region_size,
+            self.boxes_per_row,
+            num_rows=self.num_rows,
+            auto_append=self.auto_append,
+            buffer_size=self.rasterizer.output_size,
+            debug=self.debug
+        )
+        self.regions = self.box_layout.regions
+        self.region_images = self.box_layout.region_images
 
     def _create_controls(self):
         """Create control buttons"""
@@ -977,110 +1265,122 @@ class CharacterOCRComponent(Component):
 
     def _start_drawing(self, event):
         """Handle drawing start"""
-        self.drawing = False
-        self.current_region = None
-        
-        # Check which region was clicked
-        for i, region in enumerate(self.regions):
-            x1, y1, x2, y2 = region['coords']
-            if x1 <= event.x <= x2 and y1 <= event.y <= y2:
-                self.drawing = True
-                self.current_region = i
-                self.last_x = event.x - x1
-                self.last_y = event.y - y1
-                
-                if self.debug:
-                    logging.debug(f"Started drawing in region {i}")
-                break
+        # The touch device reports every contact itself, so skip the pointer
+        # it emulates; a real mouse still draws
+        if self.touch_source is None or not self.touch_source.emulating_pointer():
+            self._contact_down(POINTER_CONTACT, event.x, event.y)
 
     def _draw(self, event):
         """Handle drawing motion"""
-        if not self.drawing or self.current_region is None:
+        self._contact_move(POINTER_CONTACT, event.x, event.y, event=event)
+
+    def _stop_drawing(self, event):
+        """Handle drawing end"""
+        self._contact_up(POINTER_CONTACT)
+
+    def _contact_down(self, contact_id, x, y):
+        """Start a stroke for one contact in whichever box it landed in"""
+        notify_activity()
+        i = self.box_layout.region_at(x, y)
+        if i is None:
+            return
+        
+        x1, y1 = self.regions[i]['coords'][:2]
+        contact = self.contacts.begin(contact_id, i, x - x1, y - y1)
+        contact.stroke = [self._normalize(x - x1, y - y1)]
+        self.regions[i]['strokes'].append(contact.stroke)
+        
+        if self.debug:
+            logging.debug(f"Contact {contact_id} started drawing in region {i}")
+
+    def _normalize(self, x, y):
+        """Box-relative pixels to box-normalized stroke coordinates"""
+        size = self.box_layout.region_size
+        return (x / size, y / size)
+
+    @ink_latency.instrumented
+    def _contact_move(self, contact_id, x, y, event=None):
+        """Extend a contact's stroke within its own box"""
+        contact = self.contacts.get(contact_id)
+        if contact is None:
             return
             
-        region = self.regions[self.current_region]
+        region = self.regions[contact.region]
         x1, y1, x2, y2 = region['coords']
         
-        if not (x1 <= event.x <= x2 and y1 <= event.y <= y2):
+        if not (x1 <= x <= x2 and y1 <= y <= y2):
             return
             
-        curr_x = event.x - x1
-        curr_y = event.y - y1
+        curr_x = x - x1
+        curr_y = y - y1
         
         # Draw on canvas
         self.canvas.create_line(
-            event.x, event.y,
-            self.last_x + x1, self.last_y + y1,
+            x, y,
+            contact.last_x + x1, contact.last_y + y1,
             width=self.line_width,
             fill="black",
             capstyle=tk.ROUND,
-            smooth=True
+            smooth=True,
+            tags=self.box_layout.ink_tags(contact.region)
         )
         
-        # Draw on image buffer
-        draw = ImageDraw.Draw(self.region_images[self.current_region])
-        draw.line(
-            [self.last_x, self.last_y, curr_x, curr_y],
-            fill="black",
-            width=self.line_width
-        )
+        # Record the point; the buffer is rendered when the stroke ends
+        contact.stroke.append(self._normalize(curr_x, curr_y))
         
-        self.last_x = curr_x
-        self.last_y = curr_y
+        contact.last_x = curr_x
+        contact.last_y = curr_y
 
-    def _stop_drawing(self, event):
-        """Handle drawing end"""
-        if self.drawing and self.current_region is not None and self.debug:
-            logging.debug(f"Stopped drawing in region {self.current_region}")
-        self.drawing = False
+    def _contact_up(self, contact_id):
+        """Finish a contact's stroke and queue its box for recognition"""
+        contact = self.contacts.end(contact_id)
+        if contact is None:
+            return
+        
+        if self.debug:
+            logging.debug(f"Contact {contact_id} stopped drawing in region {contact.region}")
+        
+        region = self.regions[contact.region]
+        self.region_images[contact.region] = self.rasterizer.render(region['strokes'])
+        
+        # Only recognize once nobody is writing in that box any more
+        if contact.region not in self.contacts.active_regions():
+            # Same debug image name as a Recognize press would save
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.recognition_queue.submit(
+                region['tag'],
+                self.region_images[contact.region],
+                f"region_{contact.region}_{timestamp}.png"
+            )
+        self.box_layout.mark_ink(contact.region)
 
     def clear_all(self):
         """Clear all regions"""
-        # Clear canvas
-        for region in self.regions:
-            coords = region['coords']
-            self.canvas.create_rectangle(
-                coords[0], coords[1], coords[2], coords[3],
-                fill="white",
-                outline="#2196F3",
-                width=2
-            )
-        
-        # Reset image buffers
-        self.region_images = [
-            Image.new('L', (self.region_size, self.region_size), 'white')
-            for _ in range(self.num_regions)
-        ]
+        # Remove ink and reset image buffers, keeping the layout
+        self.box_layout.clear()
+        self.contacts.clear()
+        self.recognition_queue.forget()
         
         if self.debug:
             logging.debug("Cleared all regions")
 
+    def _recognize_region_image(self, img, debug_name=None):
+        """Run single-character OCR on one box image"""
+        debug_path = None
+        if self.debug and debug_name:
+            debug_path = os.path.join(self.debug_folder, debug_name)
+        return recognize_character(img, debug_path)
+
     def recognize_characters(self):
         """Perform OCR on each region"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         results = []
         
         for i, img in enumerate(self.region_images):
-            # Preprocess image
-            img_array = np.array(img)
-            _, thresh = cv2.threshold(
-                img_array, 0, 255,
-                cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-            )
-            
-            if self.debug:
-                debug_path = os.path.join(
-                    self.debug_folder,
-                    f"region_{i}_{timestamp}.png"
-                )
-                cv2.imwrite(debug_path, thresh)
-                logging.debug(f"Saved debug image for region {i} to {debug_path}")
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(
-                thresh,
-                config='--psm 10 --oem 3'  # PSM 10 for single character
-            ).strip()
+            # Use the background result if the box hasn't changed since
+            text = self.recognition_queue.result(self.regions[i]['tag'])
+            if text is None:
+                text = self._recognize_region_image(img, f"region_{i}_{timestamp}.png")
             
             results.append(text)
             if self.debug:
@@ -1089,6 +1389,13 @@ class CharacterOCRComponent(Component):
         # Display results in a styled dialog
         self._show_results(results)
 
+    def destroy(self):
+        """Stop background input and recognition"""
+        if self.touch_source:
+            self.touch_source.stop()
+        self.recognition_queue.shutdown()
+        super().destroy()
+
     def _show_results(self, results):
         """Show recognition results in a styled dialog"""
         dialog = tk.Toplevel(self.parent)
@@ -1130,9 +1437,12 @@ class CharacterOCRComponent(Component):
 
 class NameInputOCR(Component):
     """OCR component specifically for inputting image names"""
-    def __init__(self, parent, image_path, on_confirm=None, on_cancel=None, **kwargs):
+    def __init__(self, parent, image_path, on_confirm=None, on_cancel=None,
+                 image=None, **kwargs):
         super().__init__(parent, **kwargs)
         self.image_path = image_path
+        # A capture that only exists in memory so far
+        self.image = image
         self.on_confirm = on_confirm
         self.on_cancel = on_cancel
         
@@ -1141,22 +1451,38 @@ class NameInputOCR(Component):
         self.screen_height = parent.winfo_screenheight()
         self.region_size = int(self.screen_width * 0.08)
         self.num_regions = 8
+        self.boxes_per_row = 8
+        self.max_regions = 24
         self.line_width = max(1, int(self.region_size * 0.03))
+        self.rasterizer = InkRasterizer(self.line_width / self.region_size)
         
         # Initialize the result label at class level
         self.result_label = None
         self.current_text = ""  # Add this to track the current text
         
         # Initialize drawing state
-        self.drawing = False
-        self.current_region = None
-        self.last_x = None
-        self.last_y = None
+        self.contacts = ContactTracker()
+        
+        # Free-writing line mode records whole strokes instead of boxes
+        self.line_mode = False
+        self.strokes = StrokeRecorder()
         
         # Create the UI
         self._create_ui()
         self._setup_regions()
         self._create_controls()
+        
+        # Boxes are recognized in the background as their strokes complete
+        self.recognition_queue = RegionRecognitionQueue(
+            self.frame,
+            recognize_character
+        )
+        self.touch_source = EvdevTouchSource.start_for(
+            self.canvas,
+            self._contact_down,
+            self._contact_move,
+            self._contact_up
+        )
 
     def _create_ui(self):
         """Create the main UI components"""
@@ -1208,11 +1534,12 @@ class NameInputOCR(Component):
         self.canvas.bind("<Button-1>", self._start_drawing)
         self.canvas.bind("<B1-Motion>", self._draw)
         self.canvas.bind("<ButtonRelease-1>", self._stop_drawing)
+        ink_latency.attach(self, self.canvas)
 
 
     def _show_image_preview(self):
         """Show a small preview of the captured image if available"""
-        if not self.image_path:
+        if self.image is None and not self.image_path:
             # If no image, show a message instead
             ttk.Label(
                 self.preview_frame,
@@ -1222,16 +1549,19 @@ class NameInputOCR(Component):
             return
             
         try:
-            image = Image.open(self.image_path)
-            
             # Calculate preview size
             preview_height = int(self.screen_height * 0.2)
-            aspect_ratio = image.width / image.height
-            preview_width = int(preview_height * aspect_ratio)
-            
-            # Resize image
-            image = image.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
+            if self.image is not None:
+                aspect_ratio = self.image.width / self.image.height
+                preview_width = int(preview_height * aspect_ratio)
+                
+                # Resize image
+                image = load_scaled(self.image, (preview_width, preview_height))
+                photo = ImageTk.PhotoImage(image)
+            else:
+                photo = get_photo_cache().get(
+                    self.image_path, (self.screen_width, preview_height), owner=self
+                )
             
             # Display image
             self.preview_label = ttk.Label(self.preview_frame, image=photo)
@@ -1248,31 +1578,19 @@ class NameInputOCR(Component):
 
     def _setup_regions(self):
         """Create the character input regions"""
-        self.regions = []
-        self.region_images = []
-        
-        start_x = 0
-        start_y = 0
-        
-        for i in range(self.num_regions):
-            x1 = start_x + i * self.region_size
-            y1 = start_y
-            x2 = x1 + self.region_size
-            y2 = y1 + self.region_size
-            
-            region = self.canvas.create_rectangle(
-                x1, y1, x2, y2,
-                outline="#2196F3",
-                width=2
-            )
-            
-            self.regions.append({
-                'id': region,
-                'coords': (x1, y1, x2, y2)
-            })
-            
-            img = Image.new('L', (self.region_size, self.region_size), 'white')
-            self.region_images.append(img)
+        # A new box is appended (wrapping to another row) whenever the last
+        # one gets ink, so longer names fit without rebuilding the screen
+        self.box_layout = HandwritingGrid(
+            self.canvas,
+            self.region_size,
+            self.boxes_per_row,
+            num_boxes=self.num_regions,
+            max_boxes=self.max_regions,
+            auto_append=True,
+            buffer_size=self.rasterizer.output_size
+        )
+        self.regions = self.box_layout.regions
+        self.region_images = self.box_layout.region_images
 
     def _create_controls(self):
         """Create control buttons"""
@@ -1326,27 +1644,65 @@ class NameInputOCR(Component):
             bg_color="#c6eb34"
         )
         self.cancel_btn.pack(side=tk.RIGHT, padx=20)
+        
+        # Switch between one-box-per-character and free writing
+        self.mode_btn = RoundedButton(
+            control_frame,
+            text="Free Write",
+            command=self._toggle_line_mode,
+            width=button_width,
+            height=button_height,
+            bg_color="#c6eb34"
+        )
+        self.mode_btn.pack(side=tk.RIGHT, padx=20)
 
+    def _toggle_line_mode(self):
+        """Switch the canvas between character boxes and a single line"""
+        self.line_mode = not self.line_mode
+        self.canvas.delete("all")
+        
+        if self.line_mode:
+            self.instructions.configure(text="Write the name on the line")
+            self.mode_btn.canvas.itemconfig(self.mode_btn.canvas_text, text="Boxes")
+        else:
+            self.box_layout.rebuild()
+            self.instructions.configure(text="Write one character per box to name your image")
+            self.mode_btn.canvas.itemconfig(self.mode_btn.canvas_text, text="Free Write")
+        
+        self.clear_all()
 
+    def _draw_line_guide(self):
+        """Draw a baseline to write on in line mode"""
+        width = int(self.canvas.cget('width'))
+        height = int(self.canvas.cget('height'))
+        self.canvas.create_line(
+            10, int(height * 0.8), width - 10, int(height * 0.8),
+            fill="#2196F3",
+            dash=(4, 4)
+        )
 
     def _perform_ocr(self):
         """Process the written characters and show result"""
+        if self.line_mode:
+            size = (int(self.canvas.cget('width')), int(self.canvas.cget('height')))
+            text, _ = recognize_line(self.strokes.strokes, size, self.line_width)
+            self._show_ocr_result([text] if text else [])
+            return
+        
         results = []
-        for img in self.region_images:
-            img_array = np.array(img)
-            _, thresh = cv2.threshold(
-                img_array, 0, 255,
-                cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-            )
-            
-            text = pytesseract.image_to_string(
-                thresh,
-                config='--psm 10 --oem 3'
-            ).strip()
+        for region, img in zip(self.regions, self.region_images):
+            # Boxes that were finished were already recognized in the background
+            text = self.recognition_queue.result(region['tag'])
+            if text is None:
+                text = recognize_character(img)
             
             if text:  # Only append non-empty results
                 results.append(text)
         
+        self._show_ocr_result(results)
+
+    def _show_ocr_result(self, results):
+        """Update the result label from recognized pieces of text"""
         if results:
             # Join characters and clean the filename
             self.current_text = ''.join(results)
@@ -1378,16 +1734,7 @@ class NameInputOCR(Component):
         """Process the written characters and confirm the name"""
         results = []
         for img in self.region_images:
-            img_array = np.array(img)
-            _, thresh = cv2.threshold(
-                img_array, 0, 255,
-                cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-            )
-            
-            text = pytesseract.image_to_string(
-                thresh,
-                config='--psm 10 --oem 3'
-            ).strip()
+            text = recognize_character(img)
             
             if text:  # Only append non-empty results
                 results.append(text)
@@ -1424,68 +1771,130 @@ class NameInputOCR(Component):
 
     # Drawing methods (similar to original OCR component)
     def _start_drawing(self, event):
-        self.drawing = False
-        self.current_region = None
-        
-        for i, region in enumerate(self.regions):
-            x1, y1, x2, y2 = region['coords']
-            if x1 <= event.x <= x2 and y1 <= event.y <= y2:
-                self.drawing = True
-                self.current_region = i
-                self.last_x = event.x - x1
-                self.last_y = event.y - y1
-                break
+        # The touch device reports every contact itself, so skip the pointer
+        # it emulates; a real mouse still draws
+        if self.touch_source is None or not self.touch_source.emulating_pointer():
+            self._contact_down(POINTER_CONTACT, event.x, event.y)
 
     def _draw(self, event):
-        if not self.drawing or self.current_region is None:
+        self._contact_move(POINTER_CONTACT, event.x, event.y, event=event)
+
+    def _stop_drawing(self, event):
+        self._contact_up(POINTER_CONTACT)
+
+    def _contact_down(self, contact_id, x, y):
+        """Start a stroke for one contact"""
+        notify_activity()
+        if self.line_mode:
+            # The touch device covers the whole screen; only start on the canvas
+            width = int(self.canvas.cget('width'))
+            height = int(self.canvas.cget('height'))
+            if not (0 <= x < width and 0 <= y < height):
+                return
+            # The line is a single piece of writing; one contact at a time
+            if self.strokes.current is None:
+                self.contacts.begin(contact_id, None, x, y)
+                self.strokes.begin(x, y)
+            return
+        
+        i = self.box_layout.region_at(x, y)
+        if i is not None:
+            x1, y1 = self.regions[i]['coords'][:2]
+            contact = self.contacts.begin(contact_id, i, x - x1, y - y1)
+            contact.stroke = [self._normalize(x - x1, y - y1)]
+            self.regions[i]['strokes'].append(contact.stroke)
+
+    def _normalize(self, x, y):
+        """Box-relative pixels to box-normalized stroke coordinates"""
+        size = self.box_layout.region_size
+        return (x / size, y / size)
+
+    @ink_latency.instrumented
+    def _contact_move(self, contact_id, x, y, event=None):
+        """Extend a contact's stroke"""
+        contact = self.contacts.get(contact_id)
+        if contact is None:
+            return
+        
+        if contact.region is None:
+            self.canvas.create_line(
+                contact.last_x, contact.last_y,
+                x, y,
+                width=self.line_width,
+                fill="black",
+                capstyle=tk.ROUND,
+                smooth=True
+            )
+            self.strokes.extend(x, y)
+            contact.last_x = x
+            contact.last_y = y
             return
             
-        region = self.regions[self.current_region]
+        region = self.regions[contact.region]
         x1, y1, x2, y2 = region['coords']
         
-        if not (x1 <= event.x <= x2 and y1 <= event.y <= y2):
+        if not (x1 <= x <= x2 and y1 <= y <= y2):
             return
             
-        curr_x = event.x - x1
-        curr_y = event.y - y1
+        curr_x = x - x1
+        curr_y = y - y1
         
         self.canvas.create_line(
-            event.x, event.y,
-            self.last_x + x1, self.last_y + y1,
+            x, y,
+            contact.last_x + x1, contact.last_y + y1,
             width=self.line_width,
             fill="black",
             capstyle=tk.ROUND,
-            smooth=True
+            smooth=True,
+            tags=self.box_layout.ink_tags(contact.region)
         )
         
-        draw = ImageDraw.Draw(self.region_images[self.current_region])
-        draw.line(
-            [self.last_x, self.last_y, curr_x, curr_y],
-            fill="black",
-            width=self.line_width
-        )
+        contact.stroke.append(self._normalize(curr_x, curr_y))
         
-        self.last_x = curr_x
-        self.last_y = curr_y
+        contact.last_x = curr_x
+        contact.last_y = curr_y
 
-    def _stop_drawing(self, event):
-        self.drawing = False
+    def _contact_up(self, contact_id):
+        """Finish a contact's stroke and queue its box for recognition"""
+        contact = self.contacts.end(contact_id)
+        if contact is None:
+            return
+        
+        if contact.region is None:
+            self.strokes.end()
+            return
+        
+        region = self.regions[contact.region]
+        self.region_images[contact.region] = self.rasterizer.render(region['strokes'])
+        
+        if contact.region not in self.contacts.active_regions():
+            self.recognition_queue.submit(
+                region['tag'],
+                self.region_images[contact.region]
+            )
+        self.box_layout.mark_ink(contact.region)
+
+    def destroy(self):
+        """Stop background input and recognition"""
+        if self.touch_source:
+            self.touch_source.stop()
+        self.recognition_queue.shutdown()
+        get_photo_cache().release(self)
+        super().destroy()
 
     def clear_all(self):
         """Clear all regions"""
-        for region in self.regions:
-            coords = region['coords']
-            self.canvas.create_rectangle(
-                coords[0], coords[1], coords[2], coords[3],
-                fill="white",
-                outline="#2196F3",
-                width=2
-            )
-        
-        self.region_images = [
-            Image.new('L', (self.region_size, self.region_size), 'white')
-            for _ in range(self.num_regions)
-        ]
+        if self.line_mode:
+            self.canvas.delete("all")
+            self._draw_line_guide()
+            self.strokes.clear()
+        
+        self.box_layout.clear()
+        self.contacts.clear()
+        self.recognition_queue.forget()
+        # Drop any boxes that were appended while writing
+        while len(self.regions) > self.num_regions:
+            self.box_layout.remove_box()
         
         # Update the result label text
         if self.result_label:
@@ -1622,33 +2031,25 @@ class ImageViewerDialog(Component):
         self.frame.place(relx=0.5, rely=0.5, anchor='center')
         self.frame.configure(style='Custom.TFrame')
         
+        self.viewer = None
         self._create_ui()
         
     def _create_ui(self):
         try:
-            # Load and display image
-            image = Image.open(self.image_path)
-            
             # Calculate maximum dimensions (80% of screen)
             max_width = int(self.screen_width * 0.8)
             max_height = int(self.screen_height * 0.8)
             
-            # Calculate scaling factor
-            width_ratio = max_width / image.width
-            height_ratio = max_height / image.height
-            scale_factor = min(width_ratio, height_ratio)
-            
-            new_width = int(image.width * scale_factor)
-            new_height = int(image.height * scale_factor)
-            
-            # Resize image
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(image)
+            # Cached fitted copy, shown until the tiles are ready
+            photo = get_photo_cache().get(
+                self.image_path, (max_width, max_height), owner=self
+            )
             
-            # Create image label
-            self.image_label = ttk.Label(self.frame, image=photo)
-            self.image_label.image = photo
-            self.image_label.pack(pady=10)
+            # Zoomable view that only loads the tiles on screen
+            self.viewer = TiledImageView(
+                self.frame, self.image_path, max_width, max_height, placeholder=photo
+            )
+            self.viewer.pack(pady=10)
             
             # Close button
             close_btn = RoundedButton(
@@ -1673,6 +2074,9 @@ class ImageViewerDialog(Component):
             ).pack(pady=20)
     
     def destroy(self):
+        if self.viewer:
+            self.viewer.destroy()
+        get_photo_cache().release(self)
         self.overlay.destroy()
         super().destroy()
 
@@ -1,18 +1,25 @@
 import tkinter as tk
-from PIL import Image, ImageDraw, ImageTk
+from PIL import Image, ImageDraw
 import numpy as np
 import cv2
 import pytesseract
 import os
-import subprocess
-import datetime
 import signal
 import logging
 from pathlib import Path
 import tkinter.messagebox
+import ink_latency
+from album_index import get_album_index
+from album_watcher import get_album_watcher
+from camera_service import CameraError, get_camera_service
+from derivative_pipeline import get_derivative_pipeline, notify_activity
+from image_derivatives import make_display_derivative, save_capture
+from photo_cache import get_photo_cache
+from virtual_list import PagedSource, VirtualList
+from ink_segmentation import StrokeRecorder, recognize_line
 
 class OCRScreen:
-    def __init__(self, root, width, height, callback, back_callback):
+    def __init__(self, root, width, height, callback, back_callback, line_mode=False):
         self.frame = tk.Frame(root)
         self.frame.pack(expand=True, fill=tk.BOTH)
         
@@ -77,6 +84,10 @@ class OCRScreen:
         self.last_x = None
         self.last_y = None
         
+        # In line mode a whole word is written and segmented into characters
+        self.line_mode = line_mode
+        self.strokes = StrokeRecorder()
+        
         # Create image buffer with specific size
         self.canvas_size = canvas_size
         self.image = Image.new('L', (self.canvas_size, self.canvas_size), 'white')
@@ -86,12 +97,16 @@ class OCRScreen:
         self.canvas.bind("<Button-1>", self.start_drawing)
         self.canvas.bind("<B1-Motion>", self.draw_character)
         self.canvas.bind("<ButtonRelease-1>", self.stop_drawing)
+        ink_latency.attach(self, self.canvas)
     
     def start_drawing(self, event):
+        notify_activity()
         self.drawing = True
         self.last_x = event.x
         self.last_y = event.y
+        self.strokes.begin(event.x, event.y)
     
+    @ink_latency.instrumented
     def draw_character(self, event):
         if self.drawing and self.last_x is not None and self.last_y is not None:
             # Draw on canvas
@@ -111,11 +126,14 @@ class OCRScreen:
                 width=3,
                 joint="curve"
             )
+            self.strokes.extend(event.x, event.y)
             
             self.last_x = event.x
             self.last_y = event.y
     
     def stop_drawing(self, event):
+        if self.drawing:
+            self.strokes.end()
         self.drawing = False
         self.last_x = None
         self.last_y = None
@@ -124,22 +142,32 @@ class OCRScreen:
         self.canvas.delete("all")
         self.image = Image.new('L', (self.canvas_size, self.canvas_size), 'white')
         self.draw = ImageDraw.Draw(self.image)
+        self.strokes.clear()
     
     def recognize_and_callback(self, callback):
-        # Convert to numpy array for OpenCV
-        img_array = np.array(self.image)
-        
-        # Preprocess
-        _, thresh = cv2.threshold(
-            img_array, 0, 255,
-            cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-        )
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(
-            thresh,
-            config='--psm 10 --oem 3'
-        ).strip()
+        if self.line_mode:
+            # Segment the strokes and recognize them in a single engine call
+            text, _ = recognize_line(
+                self.strokes.strokes,
+                (self.canvas_size, self.canvas_size),
+                3
+            )
+            text = ''.join(c for c in text if c.isalnum() or c in '._- ').strip()
+        else:
+            # Convert to numpy array for OpenCV
+            img_array = np.array(self.image)
+            
+            # Preprocess
+            _, thresh = cv2.threshold(
+                img_array, 0, 255,
+                cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+            )
+            
+            # Perform OCR
+            text = pytesseract.image_to_string(
+                thresh,
+                config='--psm 10 --oem 3'
+            ).strip()
         
         if text:
             callback(text)
@@ -179,9 +207,18 @@ class FlashcardApp:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         
+        # Keep the flashcard index current with files copied in from outside,
+        # and finish derivative work left over from the last run
+        get_album_watcher(self.images_dir)
+        get_derivative_pipeline(self.images_dir)
+        
         # Setup SIGINT handler
         signal.signal(signal.SIGINT, self.handle_sigint)
         
+        # Camera stream is only held while the capture screen is up
+        self.camera = get_camera_service()
+        self.camera_held = False
+        
         # Initialize main screen
         self.current_screen = None
         self.show_main_screen()
@@ -193,8 +230,12 @@ class FlashcardApp:
     
     def clear_screen(self):
         """Clear current screen contents"""
+        if self.camera_held:
+            self.camera_held = False
+            self.camera.release()
         if self.current_screen:
             self.current_screen.destroy()
+        get_photo_cache().release(self)
     
     def create_button(self, parent, text, command, height=2):
         """Create a standardized button"""
@@ -272,29 +313,28 @@ class FlashcardApp:
         ).pack(pady=20)
     
     def capture_image(self):
-        """Capture image using libcamera-jpeg"""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = self.images_dir / f"temp_{timestamp}.jpg"
-        
+        """Grab a still from the running camera stream as JPEG bytes
+
+        Nothing is written until the flashcard is labelled, so abandoned
+        captures never touch the SD card.
+        """
         try:
-            cmd = [
-                "libcamera-jpeg",
-                "-o", str(filename),
-                "--width", "2304",
-                "--height", "1296",
-                "--nopreview"
-            ]
-            
-            subprocess.run(cmd, check=True)
-            logging.info(f"Image captured: {filename}")
-            return filename
-        except subprocess.CalledProcessError as e:
+            data = self.camera.capture_jpeg()
+            logging.info(f"Image captured ({len(data)} bytes)")
+            return data
+        except CameraError as e:
             logging.error(f"Camera capture error: {e}")
             return None
     
     def start_new_flashcard(self):
         """Start new flashcard creation process"""
         self.clear_screen()
+        try:
+            # Warm up the sensor while the user frames the shot
+            self.camera.acquire()
+            self.camera_held = True
+        except CameraError as e:
+            logging.error(f"Camera start error: {e}")
         self.current_screen = tk.Frame(self.root)
         self.current_screen.pack(expand=True)
         
@@ -312,9 +352,9 @@ class FlashcardApp:
     
     def take_picture_and_label(self):
         """Capture image and proceed to labeling"""
-        image_path = self.capture_image()
-        if image_path:
-            self.current_image_path = image_path
+        image_data = self.capture_image()
+        if image_data:
+            self.current_image_data = image_data
             self.show_ocr_screen()
         else:
             tkinter.messagebox.showerror(
@@ -330,15 +370,22 @@ class FlashcardApp:
             self.screen_width,
             self.screen_height,
             self.finish_flashcard,
-            self.show_main_screen
+            self.show_main_screen,
+            line_mode=True
         )
     
     def finish_flashcard(self, label):
         """Save flashcard with OCR label"""
-        if hasattr(self, 'current_image_path'):
-            # Rename image file with label
+        if getattr(self, 'current_image_data', None):
+            # Write the capture under its label, with a screen-sized copy
             new_path = self.images_dir / f"{label}.jpg"
-            Path(self.current_image_path).rename(new_path)
+            _, display_data = make_display_derivative(
+                self.current_image_data, (self.screen_width, self.screen_height)
+            )
+            save_capture(new_path, self.current_image_data, display_data)
+            get_album_index(self.images_dir).add(new_path)
+            get_derivative_pipeline(self.images_dir).enqueue(new_path, [self._flashcard_size()])
+            self.current_image_data = None
             logging.info(f"Created flashcard: {label}")
             
             # Return to main screen
@@ -350,35 +397,16 @@ class FlashcardApp:
         self.current_screen = tk.Frame(self.root)
         self.current_screen.pack(expand=True)
         
-        # Create scrollable frame for flashcard list
-        canvas = tk.Canvas(self.current_screen)
-        scrollbar = tk.Scrollbar(
+        # Only the rows on screen get buttons, so a big deck opens at once
+        index = get_album_index(self.images_dir)
+        source = PagedSource(lambda offset, limit: index.page(offset, limit), index.count)
+        VirtualList(
             self.current_screen,
-            orient="vertical",
-            command=canvas.yview
-        )
-        scrollable_frame = tk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # List all flashcards
-        for image_file in sorted(self.images_dir.glob("*.jpg")):
-            name = image_file.stem
-            self.create_button(
-                scrollable_frame,
-                name,
-                lambda p=image_file: self.show_flashcard(p),
-                height=1
-            ).pack(pady=5)
-        
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+            source,
+            make_row=lambda parent: self.create_button(parent, "", None, height=1),
+            render=self._render_flashcard_row,
+            row_height=44
+        ).pack(fill="both", expand=True)
         
         self.create_button(
             self.current_screen,
@@ -387,19 +415,21 @@ class FlashcardApp:
             height=1
         ).pack(pady=10)
     
+    def _render_flashcard_row(self, button, entry):
+        image_file = self.images_dir / entry.name
+        button.configure(text=image_file.stem, command=lambda: self.show_flashcard(image_file))
+    
+    def _flashcard_size(self):
+        return (self.screen_width - 20, self.screen_height - 60)
+    
     def show_flashcard(self, image_path):
         """Display individual flashcard"""
         self.clear_screen()
         self.current_screen = tk.Frame(self.root)
         self.current_screen.pack(expand=True)
         
-        # Load and resize image to fit screen
-        image = Image.open(image_path)
-        image.thumbnail((
-            self.screen_width - 20,
-            self.screen_height - 60
-        ))
-        photo = ImageTk.PhotoImage(image)
+        # Load a cached copy already sized to fit the screen
+        photo = get_photo_cache().get(image_path, self._flashcard_size(), owner=self)
         
         # Display image
         label = tk.Label(self.current_screen, image=photo)
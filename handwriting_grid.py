@@ -0,0 +1,206 @@
+import logging
+
+from PIL import Image
+
+
+class HandwritingGrid:
+    """Layout engine for the character boxes on a handwriting canvas
+
+    Keeps one region dict ({'id', 'coords', 'tag', 'strokes'}) and one 'L'
+    image buffer per box. Strokes are stored normalized to the box (0..1).
+    Buffers are `buffer_size` square, or follow the box size if that is
+    None. Boxes and rows can be added or removed at any time; existing
+    boxes are moved (and rescaled if the box size changes) together with
+    the ink drawn in them, so nothing has to be rebuilt.
+
+    `regions` and `region_images` are updated in place so components can keep
+    references to them.
+    """
+    def __init__(self, canvas, region_size, boxes_per_row, num_rows=1,
+                 num_boxes=None, max_boxes=None, fit_width=None,
+                 auto_append=False, gap=0, origin=(0, 0), resize_canvas=True,
+                 buffer_size=None, outline="#2196F3", debug=False):
+        self.canvas = canvas
+        self.boxes_per_row = boxes_per_row
+        self.gap = gap
+        self.origin = origin
+        self.resize_canvas = resize_canvas
+        self.buffer_size = buffer_size
+        self.fit_width = fit_width
+        self.region_size = self._size_for(boxes_per_row) if fit_width else region_size
+        self.max_boxes = max_boxes
+        self.auto_append = auto_append
+        self.outline = outline
+        self.debug = debug
+
+        self.regions = []
+        self.region_images = []
+        self._next_tag = 0
+
+        if num_boxes is None:
+            num_boxes = boxes_per_row * num_rows
+        for _ in range(num_boxes):
+            self._append_region()
+        self._update_canvas_size()
+
+    # Layout helpers
+
+    def _size_for(self, boxes_per_row):
+        return max(1, int(self.fit_width / boxes_per_row) - self.gap)
+
+    def _coords_for(self, index):
+        row, col = divmod(index, self.boxes_per_row)
+        step = self.region_size + self.gap
+        x1 = self.origin[0] + col * step
+        y1 = self.origin[1] + row * step
+        return (x1, y1, x1 + self.region_size, y1 + self.region_size)
+
+    def _new_buffer(self):
+        size = self.buffer_size or self.region_size
+        return Image.new('L', (size, size), 'white')
+
+    @property
+    def num_rows(self):
+        return max(1, -(-len(self.regions) // self.boxes_per_row))
+
+    def _update_canvas_size(self):
+        if not self.resize_canvas:
+            return
+        step = self.region_size + self.gap
+        self.canvas.configure(
+            width=self.origin[0] + step * self.boxes_per_row - self.gap,
+            height=self.origin[1] + step * self.num_rows - self.gap
+        )
+
+    def _append_region(self):
+        index = len(self.regions)
+        coords = self._coords_for(index)
+        tag = f"region_{self._next_tag}"
+        self._next_tag += 1
+
+        region_id = self.canvas.create_rectangle(
+            *coords,
+            outline=self.outline,
+            width=2,
+            tags=(tag, 'box')
+        )
+        self.regions.append({
+            'id': region_id,
+            'coords': coords,
+            'tag': tag,
+            'strokes': []
+        })
+        self.region_images.append(self._new_buffer())
+
+        if self.debug:
+            logging.debug(f"Created region {index} at {coords}")
+
+    def _reflow(self, old_size=None):
+        """Move every box (and its ink) to the slot matching its index"""
+        old_size = old_size or self.region_size
+        scale = self.region_size / old_size
+
+        for i, region in enumerate(self.regions):
+            old_x1, old_y1 = region['coords'][:2]
+            new_coords = self._coords_for(i)
+
+            if scale != 1:
+                self.canvas.scale(region['tag'], old_x1, old_y1, scale, scale)
+            if scale != 1 and self.buffer_size is None:
+                self.region_images[i] = self.region_images[i].resize(
+                    (self.region_size, self.region_size),
+                    Image.Resampling.BOX
+                )
+
+            dx = new_coords[0] - old_x1
+            dy = new_coords[1] - old_y1
+            if dx or dy:
+                self.canvas.move(region['tag'], dx, dy)
+            region['coords'] = new_coords
+
+        if scale != 1:
+            # Keep outlines crisp after scaling
+            self.canvas.itemconfig('box', width=2)
+        self._update_canvas_size()
+
+    # Public API
+
+    def region_at(self, x, y):
+        """Index of the box containing a canvas point, or None"""
+        for i, region in enumerate(self.regions):
+            x1, y1, x2, y2 = region['coords']
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                return i
+        return None
+
+    def ink_tags(self, index):
+        """Tags to put on ink items so they follow their box on reflow"""
+        return (self.regions[index]['tag'], 'ink')
+
+    def add_box(self):
+        """Append a box, wrapping onto a new row when the current one is full"""
+        if self.max_boxes is not None and len(self.regions) >= self.max_boxes:
+            return False
+        self._append_region()
+        self._update_canvas_size()
+        return True
+
+    def remove_box(self, index=None):
+        """Remove a box and its ink; later boxes shift back to fill the gap"""
+        if len(self.regions) <= 1:
+            return False
+        if index is None:
+            index = len(self.regions) - 1
+
+        region = self.regions.pop(index)
+        self.region_images.pop(index)
+        self.canvas.delete(region['tag'])
+        self._reflow()
+        return True
+
+    def add_row(self):
+        """Fill up the last row and append a full new one"""
+        target = self.num_rows * self.boxes_per_row + self.boxes_per_row
+        while len(self.regions) < target:
+            if not self.add_box():
+                break
+
+    def remove_row(self):
+        """Remove the last row of boxes"""
+        if self.num_rows <= 1:
+            return
+        keep = (self.num_rows - 1) * self.boxes_per_row
+        while len(self.regions) > keep:
+            self.remove_box()
+
+    def set_boxes_per_row(self, boxes_per_row):
+        """Reflow the existing boxes into a different number of columns"""
+        if boxes_per_row < 1 or boxes_per_row == self.boxes_per_row:
+            return
+        old_size = self.region_size
+        self.boxes_per_row = boxes_per_row
+        if self.fit_width:
+            self.region_size = self._size_for(boxes_per_row)
+        self._reflow(old_size)
+
+    def mark_ink(self, index):
+        """Called when a stroke finishes; grows the grid if the last box was used"""
+        if self.auto_append and index == len(self.regions) - 1:
+            self.add_box()
+
+    def clear(self):
+        """Remove all ink and reset every buffer, keeping the current layout"""
+        self.canvas.delete('ink')
+        for region in self.regions:
+            region['strokes'] = []
+        self.region_images[:] = [self._new_buffer() for _ in self.regions]
+
+    def rebuild(self):
+        """Recreate box outlines after the canvas was wiped"""
+        self.canvas.delete('box')
+        count = len(self.regions)
+        self.regions.clear()
+        self.region_images.clear()
+        for _ in range(count):
+            self._append_region()
+        self._update_canvas_size()
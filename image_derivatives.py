@@ -0,0 +1,77 @@
+import io
+import os
+
+from image_loading import load_scaled
+
+
+# Big enough for the largest on-screen rendering (the viewer dialog uses
+# 80% of a 1024px wide screen)
+DISPLAY_SIZE = (1024, 1024)
+DISPLAY_QUALITY = 85
+
+# Derivatives live next to the originals, in a subdirectory
+DISPLAY_DIR = "display"
+
+
+def make_display_derivative(data, size=DISPLAY_SIZE, quality=DISPLAY_QUALITY):
+    """Display-sized copy of a JPEG frame; returns (image, jpeg bytes)
+
+    The frame is draft-decoded, so libjpeg produces a 1/2 (or smaller)
+    scale image directly and the full frame is never decoded.
+    """
+    image = load_scaled(data, size, enlarge=False)
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality)
+    return image, output.getvalue()
+
+
+def derivative_path(path):
+    directory, name = os.path.split(str(path))
+    return os.path.join(directory, DISPLAY_DIR, name)
+
+
+def save_capture(path, data, display_data=None):
+    """Write the archival JPEG and, if given, its display derivative"""
+    with open(path, 'wb') as f:
+        f.write(data)
+    if display_data is not None:
+        display_path = derivative_path(path)
+        os.makedirs(os.path.dirname(display_path), exist_ok=True)
+        with open(display_path, 'wb') as f:
+            f.write(display_data)
+
+
+def _derivative_is_current(path, display_path):
+    # save_capture writes the derivative after the original, so one older
+    # than the original was made from a file since replaced
+    try:
+        return os.stat(display_path).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def display_source(path):
+    """Path to show on screen: the derivative if it is current, else the original"""
+    display_path = derivative_path(path)
+    if _derivative_is_current(path, display_path):
+        return display_path
+    return str(path)
+
+
+def drop_stale_derivative(path):
+    """Delete the derivative of an original that was replaced or deleted"""
+    display_path = derivative_path(path)
+    if os.path.exists(display_path) and not _derivative_is_current(path, display_path):
+        try:
+            os.remove(display_path)
+        except OSError:
+            pass
+
+
+def rename_derivative(old_path, new_path):
+    """Move a derivative along with its renamed original"""
+    try:
+        os.replace(derivative_path(old_path), derivative_path(new_path))
+    except FileNotFoundError:
+        pass
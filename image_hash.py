@@ -0,0 +1,32 @@
+from PIL import Image
+
+from image_loading import load_scaled
+
+
+HASH_SIZE = 8
+
+
+def dhash(source, size=HASH_SIZE):
+    """Difference hash of an image (path, JPEG bytes or PIL image)
+
+    The image is shrunk to (size + 1) x size grey pixels and each bit says
+    whether a pixel is brighter than its right-hand neighbour, so the hash
+    survives rescaling, recompression and small exposure changes. Returns
+    a size * size bit integer.
+    """
+    # Draft decode first; the hash only needs a few dozen pixels
+    image = load_scaled(source, (size * 8, size * 8), enlarge=False)
+    image = image.convert('L').resize((size + 1, size), Image.Resampling.BOX)
+    pixels = list(image.getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
@@ -0,0 +1,132 @@
+import io
+import time
+
+from PIL import ExifTags, Image
+
+
+# EXIF IFD1 tags locating the embedded thumbnail JPEG
+THUMBNAIL_OFFSET = 0x0201
+THUMBNAIL_LENGTH = 0x0202
+
+
+def _open(source):
+    """Open JPEG bytes or a path without decoding pixel data"""
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def embedded_thumbnail(source):
+    """The EXIF thumbnail of a JPEG (bytes or path), or None if it has none
+
+    Only the APP1 header is parsed, so this costs next to nothing
+    compared with decoding the image itself.
+    """
+    try:
+        image = _open(source)
+        exif_data = image.info.get('exif')
+        if not exif_data:
+            return None
+        ifd1 = image.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset = ifd1.get(THUMBNAIL_OFFSET)
+        length = ifd1.get(THUMBNAIL_LENGTH)
+        if offset is None or not length:
+            return None
+        # Offsets count from the TIFF header, just after "Exif\0\0"
+        tiff = exif_data[6:] if exif_data.startswith(b'Exif') else exif_data
+        thumbnail = Image.open(io.BytesIO(tiff[offset:offset + length]))
+        thumbnail.load()
+        return thumbnail
+    except Exception:
+        return None
+
+
+def draft_image(source, size):
+    """Decode a JPEG with DCT scaling to the smallest 1/2, 1/4 or 1/8 scale
+    that is still at least `size`"""
+    image = _open(source)
+    image.draft('RGB', size)
+    return image.convert('RGB')
+
+
+def fit_size(image_size, bounds):
+    """Largest size with the image's aspect ratio that fits in bounds"""
+    width, height = image_size
+    scale = min(bounds[0] / width, bounds[1] / height)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def load_scaled(source, bounds, enlarge=True, resample=Image.Resampling.LANCZOS):
+    """Load an image (path, JPEG bytes or PIL image) scaled to fit bounds
+
+    JPEGs are decoded in draft mode at the nearest power-of-two scale that
+    is still at least the target size; whatever factor is left is done
+    with an integer box reduce followed by a short resample pass.
+    """
+    image = _open(source)
+    target = fit_size(image.size, bounds)
+    if not enlarge and (target[0] > image.width or target[1] > image.height):
+        target = image.size
+    # No-op for non-JPEGs and for images that are already decoded
+    image.draft(None, target)
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+    if image.size == target:
+        image.load()
+        return image
+    return image.resize(target, resample, reducing_gap=2.0)
+
+
+def quick_preview(source, bounds):
+    """A rough image to show at once while the proper one is prepared
+
+    Uses the embedded EXIF thumbnail if it is at least a quarter of the
+    target width, otherwise a draft decode at about half the target size.
+    The result is stretched to fit `bounds` with a cheap filter.
+    """
+    image = embedded_thumbnail(source)
+    if image is None or image.width * 4 < bounds[0]:
+        image = draft_image(source, (bounds[0] // 2, bounds[1] // 2))
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image.resize(fit_size(image.size, bounds), Image.Resampling.BILINEAR)
+
+
+def benchmark(path=None, sizes=((150, 150), (300, 300), (600, 600), (820, 614)),
+              repeat=5):
+    """Compare open+LANCZOS resize against load_scaled for typical display sizes"""
+    if path is None:
+        output = io.BytesIO()
+        Image.effect_noise((2304, 1296), 60).convert('RGB').save(output, 'JPEG', quality=93)
+        source = output.getvalue()
+        print("Synthetic 2304x1296 JPEG")
+    else:
+        with open(path, 'rb') as f:
+            source = f.read()
+        print(path)
+
+    def old_path(bounds):
+        image = Image.open(io.BytesIO(source))
+        return image.resize(fit_size(image.size, bounds), Image.Resampling.LANCZOS)
+
+    def run(action, bounds):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            action(bounds)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    for bounds in sizes:
+        old_ms = run(old_path, bounds)
+        new_ms = run(lambda b: load_scaled(source, b), bounds)
+        print(f"{bounds[0]:>4}x{bounds[1]:<4} open+resize {old_ms:7.1f} ms   "
+              f"load_scaled {new_ms:7.1f} ms   {old_ms / new_ms:4.1f}x")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
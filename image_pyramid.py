@@ -0,0 +1,142 @@
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+
+from PIL import Image
+
+from thumbnail_cache import get_thumbnail_cache, source_key
+
+
+TILE_SIZE = 256
+TILE_QUALITY = 85
+# Under the thumbnail cache directory, one subdirectory per source file
+TILE_DIR = "tiles"
+MAX_PYRAMIDS = 24
+META_NAME = "meta.json"
+
+
+def pyramid_root():
+    return os.path.join(get_thumbnail_cache().directory, TILE_DIR)
+
+
+class ImagePyramid:
+    """An image cut into tiles at full, 1/2, 1/4, ... resolution
+
+    Level 0 is the original; each level halves the one before until the
+    whole image fits in one tile. Tiles are JPEGs named level_col_row and
+    meta.json is written last, so a pyramid is either complete or absent.
+    The directory is keyed like the thumbnail cache, so an edited image
+    gets a new pyramid.
+    """
+    def __init__(self, path, root=None, tile_size=TILE_SIZE):
+        self.path = str(path)
+        self.tile_size = tile_size
+        self.root = root or pyramid_root()
+        self.directory = os.path.join(self.root, source_key(self.path))
+        self.meta = self._read_meta()
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.directory, META_NAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def ready(self):
+        return self.meta is not None
+
+    def build(self):
+        """Cut the tiles if they aren't there yet (slow: decodes the full image)"""
+        if self.ready:
+            self.touch()
+            return
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = f"{self.directory}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            image = Image.open(self.path).convert('RGB')
+            size = image.size
+            levels = []
+            t = self.tile_size
+            while True:
+                width, height = image.size
+                for row in range(math.ceil(height / t)):
+                    for col in range(math.ceil(width / t)):
+                        box = (col * t, row * t, min(width, (col + 1) * t), min(height, (row + 1) * t))
+                        image.crop(box).save(
+                            os.path.join(tmp_dir, f"{len(levels)}_{col}_{row}.jpg"),
+                            format='JPEG', quality=TILE_QUALITY
+                        )
+                levels.append([width, height])
+                if width <= t and height <= t:
+                    break
+                image = image.reduce(2)
+
+            meta = {'size': list(size), 'tile_size': t, 'levels': levels}
+            with open(os.path.join(tmp_dir, META_NAME), 'w') as f:
+                json.dump(meta, f)
+            try:
+                os.replace(tmp_dir, self.directory)
+            except OSError:
+                # Someone else finished it first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self.meta = self._read_meta()
+        prune(self.root)
+
+    def touch(self):
+        """Mark as recently used so prune() keeps it"""
+        try:
+            os.utime(self.directory)
+        except OSError:
+            pass
+
+    @property
+    def size(self):
+        return tuple(self.meta['size'])
+
+    @property
+    def levels(self):
+        return len(self.meta['levels'])
+
+    def level_size(self, level):
+        return tuple(self.meta['levels'][level])
+
+    def level_for_scale(self, scale):
+        """Coarsest level that still has at least `scale` of full resolution"""
+        level = 0
+        while level + 1 < self.levels and 0.5 ** (level + 1) >= scale:
+            level += 1
+        return level
+
+    def grid(self, level):
+        """(columns, rows) of tiles at a level"""
+        width, height = self.level_size(level)
+        t = self.tile_size
+        return math.ceil(width / t), math.ceil(height / t)
+
+    def load_tile(self, level, col, row):
+        image = Image.open(os.path.join(self.directory, f"{level}_{col}_{row}.jpg"))
+        image.load()
+        return image
+
+
+def prune(root=None, keep=MAX_PYRAMIDS):
+    """Delete all but the `keep` most recently used pyramids"""
+    root = root or pyramid_root()
+    try:
+        with os.scandir(root) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it
+                       if e.is_dir() and not e.name.endswith('.tmp')]
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+        logging.debug(f"Pruned image pyramid {path}")
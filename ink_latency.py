@@ -0,0 +1,241 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+
+# Set FLASHCARD_INK_OVERLAY=1 to show the live latency overlay on every
+# handwriting canvas. Stats are always collected; set
+# FLASHCARD_INK_LATENCY_FILE to a path to have them written there on exit.
+OVERLAY_ENV = "FLASHCARD_INK_OVERLAY"
+DUMP_PATH_ENV = "FLASHCARD_INK_LATENCY_FILE"
+DEFAULT_DUMP_PATH = "ink_latency.json"
+
+# Tk event timestamps are 32-bit X server milliseconds
+EVENT_TIME_WRAP = 2 ** 32
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram, cheap enough to update on every motion event"""
+    def __init__(self, bounds=(1, 2, 4, 8, 16, 33, 50, 100, 250, 500)):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Record a single sample"""
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the given percentile"""
+        if not self.count:
+            return 0.0
+
+        target = self.count * pct / 100.0
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            'count': self.count,
+            'mean': round(self.mean(), 3),
+            'p50': round(self.percentile(50), 3),
+            'p95': round(self.percentile(95), 3),
+            'p99': round(self.percentile(99), 3),
+            'max': round(self.max, 3),
+            'buckets': dict(zip(labels, self.counts))
+        }
+
+
+class InkLatencyMonitor:
+    """Collects event-to-ink timings for one kind of handwriting component
+
+    Three things are recorded per motion event:
+    - callback_ms: time spent inside the drawing handler
+    - queue_delay_ms: how long the event waited before being handled. Tk only
+      gives us X server timestamps, so for Tk events this is measured
+      relative to the fastest-handled event seen so far; evdev events carry
+      a wall-clock timestamp and are measured directly.
+    - canvas_items: number of items on the canvas, sampled every
+      `item_sample_interval` events since counting them is not free
+    """
+    def __init__(self, name, item_sample_interval=10):
+        self.name = name
+        self.item_sample_interval = item_sample_interval
+        self.callback_ms = LatencyHistogram()
+        self.queue_delay_ms = LatencyHistogram()
+        self.canvas_items = LatencyHistogram(
+            bounds=(100, 250, 500, 1000, 2500, 5000, 10000)
+        )
+        self.events = 0
+        self._clock_offset = None
+
+    def _queue_delay(self, event, now_ms):
+        if hasattr(event, 'timestamp'):
+            # evdev InputEvent, stamped by the kernel on the realtime clock
+            return max(0.0, (time.time() - event.timestamp()) * 1000.0)
+
+        event_time = getattr(event, 'time', None)
+        if not isinstance(event_time, int) or event_time <= 0:
+            return None
+
+        offset = (now_ms - event_time) % EVENT_TIME_WRAP
+        if self._clock_offset is None or offset < self._clock_offset:
+            self._clock_offset = offset
+        return offset - self._clock_offset
+
+    def record(self, event, canvas, started, finished):
+        """Record one handled event; times are time.perf_counter() values"""
+        self.events += 1
+        self.callback_ms.add((finished - started) * 1000.0)
+
+        delay = self._queue_delay(event, time.monotonic() * 1000.0)
+        if delay is not None:
+            self.queue_delay_ms.add(delay)
+
+        if canvas is not None and self.events % self.item_sample_interval == 0:
+            try:
+                self.canvas_items.add(len(canvas.find_all()))
+            except Exception:
+                # Canvas is already being torn down
+                pass
+
+    def summary(self):
+        return (
+            f"{self.name}: {self.events} events | "
+            f"draw p50 {self.callback_ms.percentile(50):.1f}ms "
+            f"p95 {self.callback_ms.percentile(95):.1f}ms | "
+            f"queue p95 {self.queue_delay_ms.percentile(95):.1f}ms | "
+            f"items max {int(self.canvas_items.max)}"
+        )
+
+    def to_dict(self):
+        return {
+            'events': self.events,
+            'callback_ms': self.callback_ms.to_dict(),
+            'queue_delay_ms': self.queue_delay_ms.to_dict(),
+            'canvas_items': self.canvas_items.to_dict()
+        }
+
+
+class LatencyOverlay:
+    """Small text overlay in the corner of a canvas showing live stats"""
+    def __init__(self, canvas, monitor, refresh_ms=500):
+        self.canvas = canvas
+        self.monitor = monitor
+        self.refresh_ms = refresh_ms
+        self.text_id = canvas.create_text(
+            4, 4,
+            anchor='nw',
+            fill="#d32f2f",
+            font=('Courier', 9),
+            tags=('ink_latency_overlay',)
+        )
+        self._refresh()
+
+    def _refresh(self):
+        try:
+            self.canvas.itemconfig(self.text_id, text=self.monitor.summary())
+            self.canvas.tag_raise(self.text_id)
+            self.canvas.after(self.refresh_ms, self._refresh)
+        except Exception:
+            # Canvas destroyed, stop refreshing
+            pass
+
+
+_monitors = {}
+
+
+def get_monitor(name):
+    """Return the shared monitor for a component, creating it on first use"""
+    if name not in _monitors:
+        _monitors[name] = InkLatencyMonitor(name)
+    return _monitors[name]
+
+
+def overlay_enabled():
+    return os.environ.get(OVERLAY_ENV, "") not in ("", "0")
+
+
+def attach(component, canvas):
+    """Register a component's canvas and show the overlay if enabled"""
+    monitor = get_monitor(type(component).__name__)
+    if overlay_enabled():
+        LatencyOverlay(canvas, monitor)
+    return monitor
+
+
+def instrumented(handler):
+    """Decorator for drawing handlers on components with a `canvas`
+
+    Wrap the method that actually draws: a Tk `_draw(event)`, or a
+    contact handler like `_contact_move(contact_id, x, y, event=None)`
+    whose callers pass the Tk or evdev event it came from so its queue
+    delay can be measured.
+    """
+    @functools.wraps(handler)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return handler(self, *args, **kwargs)
+        finally:
+            finished = time.perf_counter()
+            event = kwargs.get('event', args[0] if args else None)
+            get_monitor(type(self).__name__).record(
+                event, getattr(self, 'canvas', None), started, finished
+            )
+    return wrapper
+
+
+def dump(path=None):
+    """Write all collected histograms to a JSON file"""
+    if not any(monitor.events for monitor in _monitors.values()):
+        return None
+
+    path = path or os.environ.get(DUMP_PATH_ENV, DEFAULT_DUMP_PATH)
+    report = {
+        'written_at': datetime.now().isoformat(timespec='seconds'),
+        'components': {
+            name: monitor.to_dict() for name, monitor in _monitors.items()
+        }
+    }
+    try:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        for monitor in _monitors.values():
+            logging.info(monitor.summary())
+    except OSError as e:
+        print(f"Error writing ink latency report: {e}")
+        return None
+    return path
+
+
+def _dump_on_exit():
+    if os.environ.get(DUMP_PATH_ENV):
+        dump()
+
+
+atexit.register(_dump_on_exit)
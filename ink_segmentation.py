@@ -0,0 +1,266 @@
+import logging
+import time
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image, ImageDraw
+
+
+class Stroke:
+    """A single pen-down to pen-up trace on the line canvas"""
+    def __init__(self, x, y, started=None):
+        self.points = [(x, y)]
+        self.started = started if started is not None else time.monotonic()
+        self.ended = self.started
+
+    def add_point(self, x, y):
+        self.points.append((x, y))
+
+    def finish(self, ended=None):
+        self.ended = ended if ended is not None else time.monotonic()
+
+    def bbox(self):
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+class StrokeRecorder:
+    """Records strokes for a free-writing line"""
+    def __init__(self):
+        self.strokes = []
+        self.current = None
+
+    def begin(self, x, y):
+        self.current = Stroke(x, y)
+
+    def extend(self, x, y):
+        if self.current is not None:
+            self.current.add_point(x, y)
+
+    def end(self):
+        if self.current is not None:
+            self.current.finish()
+            self.strokes.append(self.current)
+            self.current = None
+
+    def clear(self):
+        self.strokes = []
+        self.current = None
+
+
+class Segment:
+    """A group of strokes believed to form one character"""
+    def __init__(self, strokes, bbox):
+        self.strokes = strokes
+        self.bbox = bbox
+
+    @property
+    def width(self):
+        return self.bbox[2] - self.bbox[0]
+
+    @property
+    def height(self):
+        return self.bbox[3] - self.bbox[1]
+
+
+def render_strokes(strokes, size, line_width):
+    """Rasterize strokes into a white 'L' image of the given size"""
+    image = Image.new('L', size, 'white')
+    draw = ImageDraw.Draw(image)
+    radius = line_width / 2
+    for stroke in strokes:
+        if len(stroke.points) > 1:
+            draw.line(stroke.points, fill="black", width=line_width, joint="curve")
+        for x, y in (stroke.points[0], stroke.points[-1]):
+            draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill="black")
+    return image
+
+
+def _union_bbox(a, b):
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def segment_strokes(strokes, size, line_width, overlap_ratio=0.4,
+                    join_gap=None, stroke_pause=0.35):
+    """Split a line of handwriting into per-character segments
+
+    Strokes are first grouped by the connected ink components they touch, so
+    strokes that cross or meet become one character. Groups are then merged
+    when they overlap horizontally (dots, crossbars) or when they sit within
+    `join_gap` pixels of each other and were written without a pause longer
+    than `stroke_pause` seconds. Returns segments ordered left to right.
+    """
+    if not strokes:
+        return []
+
+    if join_gap is None:
+        join_gap = line_width * 2
+
+    # Connected components on the rasterized line
+    ink = 255 - np.array(render_strokes(strokes, size, line_width))
+    _, labels = cv2.connectedComponents((ink > 127).astype(np.uint8), connectivity=8)
+
+    # Union-find over strokes that share a component
+    parent = list(range(len(strokes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a, b):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[rb] = ra
+
+    owner = {}
+    height, width = labels.shape
+    for i, stroke in enumerate(strokes):
+        for x, y in stroke.points:
+            xi = min(max(int(x), 0), width - 1)
+            yi = min(max(int(y), 0), height - 1)
+            label = labels[yi, xi]
+            if label == 0:
+                continue
+            if label in owner:
+                union(i, owner[label])
+            else:
+                owner[label] = i
+
+    groups = {}
+    for i in range(len(strokes)):
+        groups.setdefault(find(i), []).append(i)
+
+    segments = []
+    for members in groups.values():
+        members.sort(key=lambda i: strokes[i].started)
+        bbox = strokes[members[0]].bbox()
+        for i in members[1:]:
+            bbox = _union_bbox(bbox, strokes[i].bbox())
+        segments.append(([strokes[i] for i in members], bbox))
+
+    segments.sort(key=lambda s: s[1][0])
+
+    # Merge neighbours that overlap horizontally or were written together
+    merged = [segments[0]]
+    for seg_strokes, bbox in segments[1:]:
+        prev_strokes, prev_bbox = merged[-1]
+        overlap = min(prev_bbox[2], bbox[2]) - max(prev_bbox[0], bbox[0])
+        narrower = max(1, min(prev_bbox[2] - prev_bbox[0], bbox[2] - bbox[0]))
+        gap = bbox[0] - prev_bbox[2]
+
+        pause = min(
+            abs(a.started - b.ended) if a.started >= b.ended else abs(b.started - a.ended)
+            for a in seg_strokes for b in prev_strokes
+        )
+
+        if overlap >= overlap_ratio * narrower or (gap <= join_gap and pause <= stroke_pause):
+            merged[-1] = (prev_strokes + seg_strokes, _union_bbox(prev_bbox, bbox))
+        else:
+            merged.append((seg_strokes, bbox))
+
+    return [Segment(s, b) for s, b in merged]
+
+
+def compose_line(segments, line_image, line_width, target_height=64,
+                 spacing=None, space_gap=0.6):
+    """Lay segments out on a normalized strip for a single OCR pass
+
+    Each segment is cropped, scaled to a common height and placed with even
+    spacing. Gaps wider than `space_gap` times the median character height
+    are kept as a wider space so the engine reports a word break.
+    """
+    if spacing is None:
+        spacing = target_height // 3
+
+    heights = sorted(max(1, s.height) for s in segments)
+    median_height = heights[len(heights) // 2]
+    pad = line_width
+
+    crops = []
+    for i, segment in enumerate(segments):
+        x1, y1, x2, y2 = segment.bbox
+        crop = line_image.crop((
+            max(0, int(x1 - pad)), max(0, int(y1 - pad)),
+            int(x2 + pad) + 1, int(y2 + pad) + 1
+        ))
+        # Scale relative to the median height so small letters stay small
+        scale = target_height / (median_height + 2 * pad)
+        new_size = (
+            max(1, int(crop.width * scale)),
+            max(1, int(crop.height * scale))
+        )
+        crop = crop.resize(new_size, Image.Resampling.BOX)
+
+        gap_before = spacing
+        if i > 0 and x1 - segments[i - 1].bbox[2] > space_gap * median_height:
+            gap_before = spacing * 3
+        crops.append((crop, gap_before, (y1 + y2) / 2))
+
+    margin = target_height // 2
+    strip_width = margin * 2 + sum(c.width + g for c, g, _ in crops)
+    strip_height = target_height * 2 + margin * 2
+    strip = Image.new('L', (strip_width, strip_height), 'white')
+
+    line_center = sum(center for _, _, center in crops) / len(crops)
+    x = margin
+    for i, (crop, gap_before, center) in enumerate(crops):
+        if i > 0:
+            x += gap_before
+        # Keep each character's vertical offset from the line centre
+        offset = (center - line_center) * target_height / (median_height + 2 * pad)
+        y = int(strip_height / 2 + offset - crop.height / 2)
+        y = min(max(0, y), strip_height - crop.height)
+        strip.paste(crop, (x, y))
+        x += crop.width
+
+    return strip
+
+
+def recognize_character(image, debug_path=None):
+    """Recognize a single handwritten character from one box image"""
+    _, thresh = cv2.threshold(
+        np.array(image), 0, 255,
+        cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )
+    if debug_path:
+        cv2.imwrite(debug_path, thresh)
+        logging.debug(f"Saved debug image to {debug_path}")
+
+    # PSM 10 treats the image as a single character
+    return pytesseract.image_to_string(
+        thresh,
+        config='--psm 10 --oem 3'
+    ).strip()
+
+
+def recognize_line(strokes, size, line_width, debug_path=None):
+    """Segment a free-written line and recognize it with one engine call
+
+    Returns (text, segments).
+    """
+    segments = segment_strokes(strokes, size, line_width)
+    if not segments:
+        return "", segments
+
+    line_image = render_strokes(strokes, size, line_width)
+    strip = compose_line(segments, line_image, line_width)
+
+    _, thresh = cv2.threshold(
+        np.array(strip), 0, 255,
+        cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+    )
+    if debug_path:
+        cv2.imwrite(debug_path, thresh)
+
+    # PSM 7 treats the strip as a single text line
+    text = pytesseract.image_to_string(
+        thresh,
+        config='--psm 7 --oem 3'
+    ).strip()
+
+    logging.debug(f"Line recognized {len(segments)} segments as: '{text}'")
+    return text, segments
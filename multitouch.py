@@ -0,0 +1,306 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+try:
+    import evdev
+    from evdev import ecodes
+except ImportError:  # Not installed on dev machines; pointer input still works
+    evdev = None
+    ecodes = None
+
+
+# Contact id used for the Tk pointer (mouse or single-touch emulation)
+POINTER_CONTACT = 'pointer'
+
+# Set to a /dev/input/event* path to force a device, or "0" to disable
+TOUCH_DEVICE_ENV = "FLASHCARD_TOUCH_DEVICE"
+# Pointer events this soon after touch activity are the touchscreen's emulation
+POINTER_EMULATION_S = 0.25
+
+
+class ContactState:
+    """Stroke state for one finger/pen on the canvas"""
+    def __init__(self, contact_id, region, x, y):
+        self.contact_id = contact_id
+        self.region = region
+        self.last_x = x
+        self.last_y = y
+        # Points of the stroke in progress, in whatever units the owner uses
+        self.stroke = None
+
+
+class ContactTracker:
+    """Keeps independent stroke state per active contact"""
+    def __init__(self):
+        self.contacts = {}
+
+    def begin(self, contact_id, region, x, y):
+        contact = ContactState(contact_id, region, x, y)
+        self.contacts[contact_id] = contact
+        return contact
+
+    def get(self, contact_id):
+        return self.contacts.get(contact_id)
+
+    def end(self, contact_id):
+        return self.contacts.pop(contact_id, None)
+
+    def active_regions(self):
+        return {c.region for c in self.contacts.values() if c.region is not None}
+
+    def clear(self):
+        self.contacts.clear()
+
+
+class RegionRecognitionQueue:
+    """Recognizes boxes in the background as their strokes complete
+
+    Each submit gives the box a new version; a result is only kept if no
+    newer ink arrived (and the box wasn't cleared) while it was being
+    recognized. Versions come from one counter that is never reset, so
+    ink written after a clear can't be mistaken for the cleared ink. Results are delivered on the
+    Tk loop through `on_result(key, text)`.
+    """
+    def __init__(self, widget, recognize, on_result=None, poll_ms=50):
+        self.widget = widget
+        self.recognize = recognize
+        self.on_result = on_result
+        self.poll_ms = poll_ms
+
+        self._lock = threading.Condition()
+        self._pending = {}
+        self._last_version = 0
+        self._versions = {}
+        self._results = {}
+        self._done = queue.Queue()
+        self._running = True
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        self.widget.after(self.poll_ms, self._poll)
+
+    def submit(self, key, image, *args):
+        """Queue a copy of a box image for recognition; args go to recognize()"""
+        with self._lock:
+            self._last_version += 1
+            version = self._last_version
+            self._versions[key] = version
+            self._pending[key] = (version, image.copy(), args)
+            self._lock.notify()
+
+    def result(self, key):
+        """Latest text for a box, '' if it never had ink, None if stale"""
+        with self._lock:
+            if key not in self._versions:
+                return ""
+            version, text = self._results.get(key, (None, None))
+            if version != self._versions[key]:
+                return None
+            return text
+
+    def forget(self, key=None):
+        """Drop state for one box (or all boxes) after it was cleared"""
+        with self._lock:
+            if key is None:
+                self._pending.clear()
+                self._versions.clear()
+                self._results.clear()
+            else:
+                self._pending.pop(key, None)
+                self._versions.pop(key, None)
+                self._results.pop(key, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._running and not self._pending:
+                    self._lock.wait()
+                if not self._running:
+                    return
+                key, (version, image, args) = self._pending.popitem()
+
+            try:
+                text = self.recognize(image, *args)
+            except Exception as e:
+                logging.error(f"Background recognition failed for {key}: {e}")
+                continue
+
+            with self._lock:
+                if self._versions.get(key) != version:
+                    continue
+                self._results[key] = (version, text)
+            self._done.put((key, text))
+
+    def _poll(self):
+        if not self._running:
+            return
+        # after() on a destroyed widget doesn't fail, so check for it here
+        if not self.widget.winfo_exists():
+            self.shutdown()
+            return
+        try:
+            while True:
+                key, text = self._done.get_nowait()
+                if self.on_result:
+                    self.on_result(key, text)
+        except queue.Empty:
+            pass
+        self.widget.after(self.poll_ms, self._poll)
+
+    def shutdown(self):
+        with self._lock:
+            self._running = False
+            self._lock.notify_all()
+
+
+class EvdevTouchSource:
+    """Reads multi-touch contacts (protocol B) straight from the input device
+
+    Tk on X11 only sees a single emulated pointer, so concurrent contacts are
+    read on a background thread and replayed on the Tk loop as
+    on_down(id, x, y) / on_move(id, x, y, event=...) / on_up(id) in widget
+    coordinates. on_move gets the evdev event of the report, whose
+    timestamp shows how long the move waited.
+    """
+    def __init__(self, widget, on_down, on_move, on_up, device, poll_ms=8):
+        self.widget = widget
+        self.on_down = on_down
+        self.on_move = on_move
+        self.on_up = on_up
+        self.device = device
+        self.poll_ms = poll_ms
+
+        x_info = device.absinfo(ecodes.ABS_MT_POSITION_X)
+        y_info = device.absinfo(ecodes.ABS_MT_POSITION_Y)
+        self.x_range = (x_info.min, x_info.max)
+        self.y_range = (y_info.min, y_info.max)
+
+        self.active = True
+        self._touching = False
+        self._last_touch = 0.0
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+        self.widget.after(self.poll_ms, self._poll)
+
+    @classmethod
+    def start_for(cls, widget, on_down, on_move, on_up):
+        """Open the touchscreen if one is available, otherwise return None"""
+        if evdev is None:
+            return None
+
+        path = os.environ.get(TOUCH_DEVICE_ENV)
+        if path == "0":
+            return None
+
+        try:
+            candidates = [path] if path else evdev.list_devices()
+        except OSError as e:
+            logging.warning(f"Multi-touch unavailable: {e}")
+            return None
+
+        for candidate in candidates:
+            # One unreadable device shouldn't hide the touchscreen
+            try:
+                device = evdev.InputDevice(candidate)
+                abs_codes = dict(device.capabilities()).get(ecodes.EV_ABS, [])
+                codes = {c[0] if isinstance(c, tuple) else c for c in abs_codes}
+                if ecodes.ABS_MT_SLOT in codes and ecodes.ABS_MT_POSITION_X in codes:
+                    logging.info(f"Using multi-touch device {device.path} ({device.name})")
+                    return cls(widget, on_down, on_move, on_up, device)
+                device.close()
+            except OSError as e:
+                logging.debug(f"Skipping input device {candidate}: {e}")
+        logging.info("No multi-touch device found")
+        return None
+
+    def emulating_pointer(self):
+        """True if a Tk pointer event now is likely the touchscreen's emulated one
+
+        X also turns the first contact into pointer events. Those arrive
+        while a contact is down or just after; a mouse or VNC pointer used
+        on its own does not, so it keeps working alongside the touchscreen.
+        """
+        return self._touching or time.monotonic() - self._last_touch < POINTER_EMULATION_S
+
+    def _read(self):
+        slot = 0
+        slots = {}
+        changed = set()
+        try:
+            for event in self.device.read_loop():
+                if not self.active:
+                    break
+                self._last_touch = time.monotonic()
+                if event.type == ecodes.EV_ABS:
+                    if event.code == ecodes.ABS_MT_SLOT:
+                        slot = event.value
+                    elif event.code == ecodes.ABS_MT_TRACKING_ID:
+                        if event.value < 0:
+                            if slot in slots:
+                                slots[slot]['up'] = True
+                        else:
+                            slots[slot] = {'id': event.value, 'x': None, 'y': None,
+                                           'down': False, 'up': False}
+                        changed.add(slot)
+                    elif event.code == ecodes.ABS_MT_POSITION_X and slot in slots:
+                        slots[slot]['x'] = event.value
+                        changed.add(slot)
+                    elif event.code == ecodes.ABS_MT_POSITION_Y and slot in slots:
+                        slots[slot]['y'] = event.value
+                        changed.add(slot)
+                elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                    for s in changed:
+                        contact = slots.get(s)
+                        if contact is None or contact['x'] is None or contact['y'] is None:
+                            continue
+                        if contact['up']:
+                            self._events.put(('up', contact['id'], None, None, event))
+                            del slots[s]
+                        elif not contact['down']:
+                            contact['down'] = True
+                            self._events.put(('down', contact['id'], contact['x'], contact['y'], event))
+                        else:
+                            self._events.put(('move', contact['id'], contact['x'], contact['y'], event))
+                    changed.clear()
+                    self._touching = bool(slots)
+        except OSError as e:
+            logging.warning(f"Touch device read stopped: {e}")
+
+    def _to_widget(self, raw_x, raw_y):
+        screen_x = (raw_x - self.x_range[0]) / max(1, self.x_range[1] - self.x_range[0])
+        screen_y = (raw_y - self.y_range[0]) / max(1, self.y_range[1] - self.y_range[0])
+        x = screen_x * self.widget.winfo_screenwidth() - self.widget.winfo_rootx()
+        y = screen_y * self.widget.winfo_screenheight() - self.widget.winfo_rooty()
+        return x, y
+
+    def _poll(self):
+        if not self.active:
+            return
+        if not self.widget.winfo_exists():
+            self.stop()
+            return
+        try:
+            while True:
+                kind, contact_id, raw_x, raw_y, event = self._events.get_nowait()
+                if kind == 'up':
+                    self.on_up(contact_id)
+                    continue
+                x, y = self._to_widget(raw_x, raw_y)
+                if kind == 'down':
+                    self.on_down(contact_id, x, y)
+                else:
+                    self.on_move(contact_id, x, y, event=event)
+        except queue.Empty:
+            pass
+        self.widget.after(self.poll_ms, self._poll)
+
+    def stop(self):
+        self.active = False
+        try:
+            self.device.close()
+        except Exception:
+            pass
@@ -0,0 +1,142 @@
+import logging
+import os
+from collections import OrderedDict
+
+from PIL import ImageTk
+
+from image_derivatives import display_source
+from thumbnail_cache import get_thumbnail_cache
+
+
+# Decoded images cost width * height * 4 bytes inside Tk
+BYTES_PER_PIXEL = 4
+DEFAULT_MAX_BYTES = 48 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ('photo', 'stamp', 'nbytes', 'owners')
+
+    def __init__(self, photo, stamp):
+        self.photo = photo
+        self.stamp = stamp
+        self.nbytes = photo.width() * photo.height() * BYTES_PER_PIXEL
+        self.owners = set()
+
+
+class PhotoCache:
+    """LRU of Tk images keyed by (path, size) with a memory budget
+
+    Screens ask for images with get(..., owner=self) and call
+    release(self) when they are torn down. Images an owner still holds are
+    never evicted (a label is showing them, so dropping our reference would
+    not free anything); released ones stay cached for a quick revisit until
+    the budget pushes them out, least recently used first.
+
+    Tk images may only be made on the Tk thread, so this is not locked.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._owned = {}
+
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _stamp(path):
+        # A rewritten file must not be served from the cache
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, size, owner=None, loader=None):
+        """PhotoImage of `path` scaled to fit `size`
+
+        loader() returns the PIL image to use on a miss (by default the
+        thumbnail cache's copy of the display derivative); if it returns
+        None, so does get().
+        """
+        key = (os.path.abspath(str(path)), tuple(size))
+        stamp = self._stamp(path)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.stamp != stamp:
+            self._drop(key)
+            entry = None
+
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            if loader is None:
+                image = get_thumbnail_cache().get(display_source(path), size)
+            else:
+                image = loader()
+                if image is None:
+                    return None
+            self.misses += 1
+            entry = _Entry(ImageTk.PhotoImage(image), stamp)
+            self._entries[key] = entry
+            self.resident_bytes += entry.nbytes
+
+        if owner is not None:
+            entry.owners.add(id(owner))
+            self._owned.setdefault(id(owner), set()).add(key)
+        self._evict()
+        return entry.photo
+
+    def release(self, owner):
+        """Let go of every image `owner` holds; they stay cached but evictable"""
+        for key in self._owned.pop(id(owner), ()):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.owners.discard(id(owner))
+        self._evict()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.resident_bytes -= entry.nbytes
+        for owner in entry.owners:
+            self._owned.get(owner, set()).discard(key)
+
+    def _evict(self):
+        if self.resident_bytes <= self.max_bytes:
+            return
+        for key in [k for k, e in self._entries.items() if not e.owners]:
+            if self.resident_bytes <= self.max_bytes:
+                break
+            self._drop(key)
+            self.evictions += 1
+        if self.resident_bytes > self.max_bytes:
+            logging.debug(f"Photo cache over budget with everything in use: "
+                          f"{self.resident_bytes} bytes")
+
+    def clear(self):
+        """Drop everything no one holds"""
+        for key in [k for k, e in self._entries.items() if not e.owners]:
+            self._drop(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'resident_bytes': self.resident_bytes,
+            'held_bytes': sum(e.nbytes for e in self._entries.values() if e.owners),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions
+        }
+
+
+_cache = None
+
+
+def get_photo_cache():
+    """Return the process-wide decoded image cache"""
+    global _cache
+    if _cache is None:
+        _cache = PhotoCache()
+    return _cache
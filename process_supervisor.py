@@ -0,0 +1,229 @@
+import atexit
+import ctypes
+import logging
+import signal
+import subprocess
+import threading
+import time
+
+
+PR_SET_PDEATHSIG = 1
+
+# Every supervisor that may still own a process, for the exit hook
+_live = set()
+_live_lock = threading.Lock()
+
+
+# Looked up here rather than in the child: loading a library between fork
+# and exec in a threaded process can deadlock
+try:
+    _prctl = ctypes.CDLL("libc.so.6", use_errno=True).prctl
+except (OSError, AttributeError):
+    _prctl = None
+
+
+def _die_with_parent():
+    """preexec_fn: have the kernel SIGTERM the child if we die without cleanup"""
+    _prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+
+
+class LifecycleMetrics:
+    """Durations (ms) and counters recorded over the life of a process"""
+    def __init__(self, keep=50):
+        self.keep = keep
+        self.durations = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        with self._lock:
+            values = self.durations.setdefault(name, [])
+            values.append(ms)
+            del values[:-self.keep]
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            result = dict(self.counts)
+            for name, values in self.durations.items():
+                result[name] = {
+                    'last_ms': values[-1],
+                    'mean_ms': sum(values) / len(values),
+                    'max_ms': max(values),
+                    'runs': len(values)
+                }
+            return result
+
+
+class ProcessSupervisor:
+    """Owns one long-running subprocess
+
+    Restarts it with exponential backoff if it exits on its own, gives up
+    after `max_restarts` crashes in a row without a successful start, and
+    makes sure it is gone on stop() or interpreter exit. on_start(process)
+    is called after every launch (e.g. to attach pipe readers); the owner
+    calls mark_ready() once the process is actually useful, which is what
+    the startup time is measured to and what resets the crash count.
+
+    All launches happen on one monitor thread that lives until the process
+    is gone, since PDEATHSIG fires when the forking thread exits.
+    """
+    def __init__(self, name, command, on_start=None, metrics=None,
+                 max_restarts=5, backoff=0.5, max_backoff=10.0,
+                 stop_timeout=2.0, **popen_kwargs):
+        self.name = name
+        self.command = command
+        self.on_start = on_start
+        self.metrics = metrics or LifecycleMetrics()
+        self.max_restarts = max_restarts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stop_timeout = stop_timeout
+        self.popen_kwargs = popen_kwargs
+
+        self.process = None
+        self.active = False
+        self.failed = False
+        self._crashes = 0
+        self._generation = 0
+        self._wake = threading.Event()
+        self._launched_at = None
+        self._lock = threading.RLock()
+
+    def start(self):
+        """Launch the process; returns once the first launch was attempted"""
+        with self._lock:
+            if self.active:
+                return
+            self.active = True
+            self.failed = False
+            self._crashes = 0
+            self._generation += 1
+            self._wake = threading.Event()
+            with _live_lock:
+                _live.add(self)
+
+        launched = threading.Event()
+        threading.Thread(
+            target=self._run, args=(self._generation, self._wake, launched),
+            daemon=True
+        ).start()
+        launched.wait()
+
+    def _current(self, generation):
+        return self.active and self._generation == generation
+
+    def _launch(self):
+        command = self.command() if callable(self.command) else self.command
+        self._launched_at = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                command, preexec_fn=_die_with_parent if _prctl else None, **self.popen_kwargs
+            )
+        except OSError as e:
+            logging.error(f"{self.name}: launch failed: {e}")
+            self.metrics.count('launch_failures')
+            return None
+
+        self.metrics.count('launches')
+        logging.info(f"{self.name}: started (pid {process.pid})")
+        if self.on_start:
+            self.on_start(process)
+        return process
+
+    def _run(self, generation, wake, launched):
+        first = True
+        while True:
+            with self._lock:
+                if not self._current(generation):
+                    launched.set()
+                    return
+                process = self._launch()
+                self.process = process
+
+            if first:
+                first = False
+                launched.set()
+                if process is None:
+                    # Missing binary or similar; retrying won't help
+                    self._give_up(generation)
+                    return
+
+            if process is not None:
+                code = process.wait()
+                with self._lock:
+                    if not self._current(generation):
+                        return
+                    logging.warning(f"{self.name}: exited unexpectedly with code {code}")
+                    self.metrics.count('crashes')
+                    self.process = None
+
+            with self._lock:
+                self._crashes += 1
+                if self._crashes > self.max_restarts:
+                    logging.error(f"{self.name}: giving up after {self.max_restarts} restarts")
+                    self._give_up(generation)
+                    return
+                delay = min(self.max_backoff, self.backoff * 2 ** (self._crashes - 1))
+            logging.info(f"{self.name}: restarting in {delay:.1f}s")
+            # stop() sets wake so we don't sit out the backoff
+            wake.wait(delay)
+            self.metrics.count('restarts')
+
+    def _give_up(self, generation):
+        with self._lock:
+            if self._generation != generation:
+                return
+            self.active = False
+            self.failed = True
+            self.process = None
+        with _live_lock:
+            _live.discard(self)
+
+    def mark_ready(self):
+        """Called by the owner when the process produced its first output"""
+        with self._lock:
+            if self._launched_at is not None:
+                self.metrics.record('startup', (time.perf_counter() - self._launched_at) * 1000)
+                self._launched_at = None
+            self._crashes = 0
+
+    def is_running(self):
+        """True while supervised, including while waiting to restart"""
+        return self.active
+
+    def stop(self):
+        with self._lock:
+            self.active = False
+            self._wake.set()
+            process, self.process = self.process, None
+        with _live_lock:
+            _live.discard(self)
+        if process is None or process.poll() is not None:
+            return
+
+        start = time.perf_counter()
+        process.terminate()
+        try:
+            process.wait(timeout=self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            logging.warning(f"{self.name}: did not exit, killing")
+            self.metrics.count('kills')
+            process.kill()
+            process.wait()
+        self.metrics.record('teardown', (time.perf_counter() - start) * 1000)
+        logging.info(f"{self.name}: stopped")
+
+
+def stop_all():
+    """Stop every supervised process; registered to run at exit"""
+    with _live_lock:
+        supervisors = list(_live)
+    for supervisor in supervisors:
+        supervisor.stop()
+
+
+atexit.register(stop_all)
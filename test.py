@@ -5,14 +5,16 @@ import subprocess
 from datetime import datetime
 import os
 import cv2
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import threading
 import queue
 import numpy as np
 import cv2
 import pytesseract
 import logging
-from PIL import Image, ImageDraw
+from PIL import ImageDraw
+import ink_latency
+from handwriting_grid import HandwritingGrid
 
 #pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
@@ -79,42 +81,28 @@ class CharacterOCRComponent:
         self.canvas.bind("<Button-1>", self._start_drawing)
         self.canvas.bind("<B1-Motion>", self._draw)
         self.canvas.bind("<ButtonRelease-1>", self._stop_drawing)
+        ink_latency.attach(self, self.canvas)
 
     def _setup_regions(self):
         """Create the character regions"""
-        self.regions = []
-        self.region_images = []
-        
         # Calculate layout
         total_width = self.num_regions * (self.region_size + 10)
         start_x = (self.screen_width - total_width) // 2
         start_y = (self.screen_height - self.region_size) // 2
         
-        for i in range(self.num_regions):
-            x1 = start_x + i * (self.region_size + 10)
-            y1 = start_y
-            x2 = x1 + self.region_size
-            y2 = y1 + self.region_size
-            
-            # Create region rectangle with blue border
-            region = self.canvas.create_rectangle(
-                x1, y1, x2, y2,
-                outline="#2196F3",  # Material Blue
-                width=2
-            )
-            
-            # Store region info
-            self.regions.append({
-                'id': region,
-                'coords': (x1, y1, x2, y2)
-            })
-            
-            # Create image buffer
-            img = Image.new('L', (self.region_size, self.region_size), 'white')
-            self.region_images.append(img)
-            
-            if self.debug:
-                logging.debug(f"Created region {i} at ({x1}, {y1}, {x2}, {y2})")
+        # Boxes are managed by the layout engine so the strip can grow or
+        # shrink without recreating the screen
+        self.box_layout = HandwritingGrid(
+            self.canvas,
+            self.region_size,
+            self.num_regions,
+            gap=10,
+            origin=(start_x, start_y),
+            resize_canvas=False,
+            debug=self.debug
+        )
+        self.regions = self.box_layout.regions
+        self.region_images = self.box_layout.region_images
 
     def _create_controls(self):
         """Create control buttons"""
@@ -165,6 +153,7 @@ class CharacterOCRComponent:
                     logging.debug(f"Started drawing in region {i}")
                 break
 
+    @ink_latency.instrumented
     def _draw(self, event):
         """Handle drawing motion"""
         if not self.drawing or self.current_region is None:
@@ -186,7 +175,8 @@ class CharacterOCRComponent:
             width=self.line_width,
             fill="black",
             capstyle=tk.ROUND,
-            smooth=True
+            smooth=True,
+            tags=self.box_layout.ink_tags(self.current_region)
         )
         
         # Draw on image buffer
@@ -202,25 +192,15 @@ class CharacterOCRComponent:
 
     def _stop_drawing(self, event):
         """Handle drawing end"""
-        if self.drawing and self.current_region is not None and self.debug:
-            logging.debug(f"Stopped drawing in region {self.current_region}")
+        if self.drawing and self.current_region is not None:
+            if self.debug:
+                logging.debug(f"Stopped drawing in region {self.current_region}")
+            self.box_layout.mark_ink(self.current_region)
         self.drawing = False
 
     def clear_all(self):
         """Clear all regions"""
-        for region in self.regions:
-            coords = region['coords']
-            self.canvas.create_rectangle(
-                coords[0], coords[1], coords[2], coords[3],
-                fill="white",
-                outline="#2196F3",
-                width=2
-            )
-        
-        self.region_images = [
-            Image.new('L', (self.region_size, self.region_size), 'white')
-            for _ in range(self.num_regions)
-        ]
+        self.box_layout.clear()
         
         if self.debug:
             logging.debug("Cleared all regions")
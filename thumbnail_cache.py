@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import os
+import threading
+
+from PIL import Image
+
+from image_loading import load_scaled
+
+
+# Override with FLASHCARD_THUMB_DIR, e.g. to put the cache on tmpfs
+THUMB_DIR_ENV = "FLASHCARD_THUMB_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "flashcard_thumbnails")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def source_key(path):
+    """Identity of a source file's current contents (path, mtime, size)"""
+    stat = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class ThumbnailCache:
+    """On-disk cache of downscaled images
+
+    Entries are keyed by source path, mtime, file size and target size, so
+    an edited or replaced image simply misses. Cache files are JPEGs; their
+    mtime doubles as last-access time and the least recently used ones are
+    deleted once the cache grows past `max_bytes`.
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, quality=85):
+        self.directory = directory or os.environ.get(THUMB_DIR_ENV, DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.quality = quality
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def key(self, path, size):
+        raw = f"{source_key(path)}|{size[0]}x{size[1]}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def cache_path(self, path, size):
+        """Cache file for `path` scaled to fit `size`, generating it if needed"""
+        cached = os.path.join(self.directory, self.key(path, size) + '.jpg')
+        if os.path.exists(cached):
+            with self._lock:
+                self.hits += 1
+            try:
+                # Mark as recently used for eviction
+                os.utime(cached)
+            except OSError:
+                pass
+            return cached
+
+        with self._lock:
+            self.misses += 1
+        self._generate(path, size, cached)
+        return cached
+
+    def get(self, path, size):
+        """Image scaled to fit within `size` (never enlarged)"""
+        image = Image.open(self.cache_path(path, size))
+        image.load()
+        return image
+
+    def _generate(self, path, size, cached):
+        image = load_scaled(path, size, enlarge=False)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        # Write under a temporary name so readers never see a partial file
+        tmp_path = f"{cached}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, format='JPEG', quality=self.quality)
+
+        with self._lock:
+            # Another thread may have generated the same entry meanwhile;
+            # only count it once
+            created = not os.path.exists(cached)
+            os.replace(tmp_path, cached)
+            if created:
+                self.total_bytes += os.path.getsize(cached)
+            over = self.total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until under 90% of the budget"""
+        target = self.max_bytes * 0.9
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        with self._lock:
+            self.total_bytes = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if self.total_bytes <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.total_bytes -= size
+                self.evictions += 1
+
+    def prewarm(self, path, sizes):
+        """Generate entries ahead of time (e.g. right after a capture is saved)"""
+        for size in sizes:
+            try:
+                self.cache_path(path, size)
+            except Exception as e:
+                logging.warning(f"Thumbnail prewarm failed for {path}: {e}")
+
+    def prewarm_async(self, path, sizes):
+        threading.Thread(target=self.prewarm, args=(path, sizes), daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+_cache = None
+
+
+def get_thumbnail_cache():
+    """Return the process-wide thumbnail cache"""
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache()
+    return _cache
@@ -0,0 +1,73 @@
+import logging
+import queue
+import threading
+from collections import OrderedDict
+
+from image_derivatives import display_source
+from thumbnail_cache import get_thumbnail_cache
+
+
+class ThumbnailPrefetcher:
+    """Decodes album thumbnails on a background thread ahead of paging
+
+    request() takes the paths of the visible page followed by the pages
+    around it, most urgent first, and replaces whatever was queued before,
+    so paging away cancels work for pages that are no longer near. Decoded
+    images are kept in a small LRU; paths are reported on `ready` as they
+    finish so the Tk side can paint them.
+    """
+    def __init__(self, size, keep=60):
+        self.size = size
+        self.keep = keep
+        self.ready = queue.Queue()
+
+        self._images = OrderedDict()
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def get(self, path):
+        """The decoded thumbnail if it is ready, else None"""
+        with self._cond:
+            image = self._images.get(path)
+            if image is not None:
+                self._images.move_to_end(path)
+            return image
+
+    def request(self, paths):
+        with self._cond:
+            self._jobs = [path for path in paths if path not in self._images]
+            self._cond.notify()
+
+    def cancel(self):
+        self.request([])
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._jobs = []
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                path = self._jobs.pop(0)
+
+            try:
+                image = get_thumbnail_cache().get(display_source(path), self.size)
+            except Exception as e:
+                logging.warning(f"Thumbnail failed for {path}: {e}")
+                continue
+
+            with self._cond:
+                self._images[path] = image
+                self._images.move_to_end(path)
+                while len(self._images) > self.keep:
+                    self._images.popitem(last=False)
+            self.ready.put(path)
@@ -0,0 +1,320 @@
+import logging
+import math
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+from image_pyramid import ImagePyramid
+from multitouch import POINTER_CONTACT, EvdevTouchSource
+
+
+MAX_ZOOM = 2.0
+# Scales are snapped so a pinch reuses resized tiles instead of making new ones
+SCALE_STEPS = 16
+# Cap on cached tiles; those the current view needs are kept even past it
+MAX_TILE_PHOTOS = 64
+
+
+class TiledImageView:
+    """Zoom and pan over an ImagePyramid, loading only the tiles in view
+
+    Drag (or one finger) pans, the wheel, a double tap or a two-finger
+    pinch zooms. Tiles are read and resized on a worker thread, visible
+    ones first and then a ring one tile beyond the viewport; any request
+    still queued when the view moves again is dropped. Until the pyramid
+    exists (it is built in the background on first view) `placeholder`
+    is shown, if given.
+    """
+    def __init__(self, parent, path, width, height, placeholder=None, poll_ms=20):
+        self.width = width
+        self.height = height
+        self.poll_ms = poll_ms
+
+        self.frame = tk.Frame(parent)
+        self.canvas = tk.Canvas(self.frame, width=width, height=height, bg='black',
+                                highlightthickness=0)
+        self.canvas.pack()
+
+        self.pyramid = ImagePyramid(path)
+        self.placeholder = placeholder
+        self.scale = None
+        self.cx = self.cy = 0.0
+
+        # key -> PhotoImage, and key -> canvas item for the tiles drawn now
+        self.photos = OrderedDict()
+        self.items = {}
+        # Tiles in view, and those plus the ring around it (kept loaded)
+        self.wanted = set()
+        self.pinned = set()
+
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._ready = queue.Queue()
+        self._stopped = False
+        self._render_pending = False
+        self._after_id = None
+        self.contacts = {}
+        self.pinch = None
+
+        threading.Thread(target=self._run, daemon=True).start()
+        self._bind_input()
+
+        if self.pyramid.ready:
+            self.pyramid.touch()
+            self._reset_view()
+        else:
+            if placeholder is not None:
+                self.canvas.create_image(width // 2, height // 2, image=placeholder, tags='placeholder')
+            with self._cond:
+                self._jobs = ['build']
+                self._cond.notify()
+        self._after_id = self.frame.after(self.poll_ms, self._poll)
+
+    def _bind_input(self):
+        self.touch_source = EvdevTouchSource.start_for(
+            self.canvas, self._contact_down, self._contact_move, self._contact_up
+        )
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_motion)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Double-Button-1>", self._on_double)
+        self.canvas.bind("<Button-4>", lambda e: self.zoom_at(e.x, e.y, 1.25))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom_at(e.x, e.y, 0.8))
+        self.canvas.bind("<MouseWheel>",
+                         lambda e: self.zoom_at(e.x, e.y, 1.25 if e.delta > 0 else 0.8))
+
+    # View geometry, in full resolution pixels
+
+    def _fit_scale(self):
+        width, height = self.pyramid.size
+        return min(self.width / width, self.height / height)
+
+    def _snap(self, scale):
+        scale = max(self._fit_scale(), min(MAX_ZOOM, scale))
+        level = self.pyramid.level_for_scale(scale)
+        step = 0.5 ** level / SCALE_STEPS
+        return max(self._fit_scale(), round(scale / step) * step)
+
+    def _reset_view(self):
+        self.canvas.delete('placeholder')
+        width, height = self.pyramid.size
+        self.scale = self._fit_scale()
+        self.cx, self.cy = width / 2, height / 2
+        self._schedule_render()
+
+    def _clamp(self):
+        width, height = self.pyramid.size
+        half_w = self.width / 2 / self.scale
+        half_h = self.height / 2 / self.scale
+        self.cx = width / 2 if half_w * 2 >= width else min(max(self.cx, half_w), width - half_w)
+        self.cy = height / 2 if half_h * 2 >= height else min(max(self.cy, half_h), height - half_h)
+
+    def pan(self, dx, dy):
+        """Move the image by (dx, dy) screen pixels"""
+        if self.scale is None:
+            return
+        self.cx -= dx / self.scale
+        self.cy -= dy / self.scale
+        self._clamp()
+        self._schedule_render()
+
+    def zoom_at(self, x, y, factor):
+        """Zoom by `factor` keeping the image point under (x, y) in place"""
+        if self.scale is None:
+            return
+        px = self.cx + (x - self.width / 2) / self.scale
+        py = self.cy + (y - self.height / 2) / self.scale
+        self.scale = self._snap(self.scale * factor)
+        self.cx = px - (x - self.width / 2) / self.scale
+        self.cy = py - (y - self.height / 2) / self.scale
+        self._clamp()
+        self._schedule_render()
+
+    # Rendering
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self._render)
+
+    def _visible(self, level, margin=0):
+        """Tile (col, row) range covering the viewport, widened by `margin` tiles"""
+        level_scale = 0.5 ** level
+        t = self.pyramid.tile_size
+        left = (self.cx - self.width / 2 / self.scale) * level_scale
+        top = (self.cy - self.height / 2 / self.scale) * level_scale
+        right = (self.cx + self.width / 2 / self.scale) * level_scale
+        bottom = (self.cy + self.height / 2 / self.scale) * level_scale
+        cols, rows = self.pyramid.grid(level)
+        return (max(0, int(left // t) - margin), min(cols - 1, int((right - 1) // t) + margin),
+                max(0, int(top // t) - margin), min(rows - 1, int((bottom - 1) // t) + margin),
+                left, top)
+
+    def _render(self):
+        self._render_pending = False
+        if self.scale is None:
+            return
+        level = self.pyramid.level_for_scale(self.scale)
+        factor = self.scale / 0.5 ** level
+        t = self.pyramid.tile_size
+        col0, col1, row0, row1, left, top = self._visible(level)
+
+        self.wanted = set()
+        missing = []
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                key = (level, col, row, round(factor * SCALE_STEPS))
+                self.wanted.add(key)
+                x = round((col * t - left) * factor)
+                y = round((row * t - top) * factor)
+                if key in self.items:
+                    self.canvas.coords(self.items[key], x, y)
+                elif key in self.photos:
+                    self.photos.move_to_end(key)
+                    self.items[key] = self.canvas.create_image(x, y, image=self.photos[key], anchor='nw')
+                else:
+                    missing.append(key)
+
+        # Old tiles stay up under the new ones until those arrive
+        for key in [k for k in self.items if k not in self.wanted]:
+            if not missing:
+                self.canvas.delete(self.items.pop(key))
+
+        # Then a ring around the viewport so small pans are already loaded
+        ring = []
+        self.pinned = set(self.wanted)
+        r_col0, r_col1, r_row0, r_row1, _, _ = self._visible(level, margin=1)
+        for row in range(r_row0, r_row1 + 1):
+            for col in range(r_col0, r_col1 + 1):
+                key = (level, col, row, round(factor * SCALE_STEPS))
+                self.pinned.add(key)
+                if key not in self.wanted and key not in self.photos:
+                    ring.append(key)
+
+        with self._cond:
+            self._jobs = missing + ring
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job = self._jobs.pop(0)
+
+            try:
+                if job == 'build':
+                    self.pyramid.build()
+                    self._ready.put(('built', None))
+                    continue
+                level, col, row, steps = job
+                tile = self.pyramid.load_tile(level, col, row)
+                factor = steps / SCALE_STEPS
+                if factor != 1:
+                    tile = tile.resize(
+                        (max(1, math.ceil(tile.width * factor)), max(1, math.ceil(tile.height * factor))),
+                        Image.Resampling.BILINEAR
+                    )
+                self._ready.put((job, tile))
+            except Exception as e:
+                logging.warning(f"Tile {job} of {self.pyramid.path} failed: {e}")
+
+    def _poll(self):
+        drawn = False
+        while True:
+            try:
+                key, tile = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            if key == 'built':
+                self._reset_view()
+                continue
+            self.photos[key] = ImageTk.PhotoImage(tile)
+            self._trim()
+            drawn = drawn or key in self.wanted
+        if drawn:
+            self._schedule_render()
+        self._after_id = self.frame.after(self.poll_ms, self._poll)
+
+    def _trim(self):
+        """Drop least recently used tiles the view doesn't need past the cap"""
+        # A large viewport may need more than the cap on its own; evicting
+        # those would only have them requested and decoded again
+        spare = len(self.photos) - MAX_TILE_PHOTOS
+        for key in [k for k in self.photos if k not in self.pinned]:
+            if spare <= 0:
+                break
+            del self.photos[key]
+            if key in self.items:
+                self.canvas.delete(self.items.pop(key))
+            spare -= 1
+
+    # Input
+
+    def _on_press(self, event):
+        # Skip the pointer the touchscreen emulates; its contacts come in directly
+        if self.touch_source is None or not self.touch_source.emulating_pointer():
+            self._contact_down(POINTER_CONTACT, event.x, event.y)
+
+    def _on_motion(self, event):
+        self._contact_move(POINTER_CONTACT, event.x, event.y)
+
+    def _on_release(self, event):
+        if POINTER_CONTACT in self.contacts:
+            self._contact_up(POINTER_CONTACT)
+
+    def _on_double(self, event):
+        if self.scale is None:
+            return
+        if self.scale > self._fit_scale() * 1.01:
+            self._reset_view()
+        else:
+            self.zoom_at(event.x, event.y, 2.0)
+
+    def _contact_down(self, contact_id, x, y):
+        self.contacts[contact_id] = (x, y)
+        if len(self.contacts) == 2 and self.scale is not None:
+            (ax, ay), (bx, by) = self.contacts.values()
+            # Zoom relative to where the pinch started so snapping can't eat small moves
+            self.pinch = (max(1.0, math.hypot(ax - bx, ay - by)), self.scale)
+
+    def _contact_move(self, contact_id, x, y, event=None):
+        if contact_id not in self.contacts:
+            return
+        before = dict(self.contacts)
+        self.contacts[contact_id] = (x, y)
+        if len(self.contacts) == 1:
+            old_x, old_y = before[contact_id]
+            self.pan(x - old_x, y - old_y)
+        elif len(self.contacts) == 2 and self.pinch is not None:
+            # Pinch: zoom around the fingers' midpoint and follow it as it moves
+            (ax, ay), (bx, by) = before.values()
+            (nax, nay), (nbx, nby) = self.contacts.values()
+            start_dist, start_scale = self.pinch
+            target = start_scale * math.hypot(nax - nbx, nay - nby) / start_dist
+            mid_x, mid_y = (nax + nbx) / 2, (nay + nby) / 2
+            self.zoom_at(mid_x, mid_y, target / self.scale)
+            self.pan(mid_x - (ax + bx) / 2, mid_y - (ay + by) / 2)
+
+    def _contact_up(self, contact_id):
+        self.contacts.pop(contact_id, None)
+        self.pinch = None
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def destroy(self):
+        self.scale = None
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.touch_source:
+            self.touch_source.stop()
+        if self._after_id is not None:
+            self.frame.after_cancel(self._after_id)
+        self.frame.destroy()
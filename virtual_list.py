@@ -0,0 +1,149 @@
+import tkinter as tk
+from collections import OrderedDict
+
+
+class PagedSource:
+    """Random access to a long ordered listing, fetched a page at a time
+
+    fetch(offset, limit) returns the rows of one page and count() the
+    total; both are called lazily and the last `keep_pages` pages are
+    kept. Call invalidate() when the underlying listing changes.
+    """
+    def __init__(self, fetch, count, page_size=50, keep_pages=8):
+        self.fetch = fetch
+        self.page_size = page_size
+        self.keep_pages = keep_pages
+        self._count_fn = count
+        self._count = None
+        self._pages = OrderedDict()
+
+    def count(self):
+        if self._count is None:
+            self._count = self._count_fn()
+        return self._count
+
+    def page(self, number):
+        rows = self._pages.get(number)
+        if rows is None:
+            rows = self.fetch(number * self.page_size, self.page_size)
+            self._pages[number] = rows
+            while len(self._pages) > self.keep_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return rows
+
+    def get(self, index):
+        rows = self.page(index // self.page_size)
+        offset = index % self.page_size
+        return rows[offset] if offset < len(rows) else None
+
+    def invalidate(self):
+        self._count = None
+        self._pages.clear()
+
+
+class VirtualList:
+    """Scrolling list that only has widgets for the rows in view
+
+    Rows are fixed height. Widgets exist only for the visible rows plus
+    `overscan` either side; as the list scrolls, rows that leave that
+    window are moved and re-rendered for the ones coming in.
+    make_row(parent) creates a row widget and render(widget, item) fills
+    it in for an item from the source.
+    """
+    def __init__(self, parent, source, make_row, render, row_height, overscan=3, **kwargs):
+        self.source = source
+        self.make_row = make_row
+        self.render = render
+        self.row_height = row_height
+        self.overscan = overscan
+
+        self.frame = tk.Frame(parent, **kwargs)
+        self.canvas = tk.Canvas(self.frame, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self.canvas.yview)
+        # The canvas reports every view change here, whatever caused it
+        self.canvas.configure(yscrollcommand=self._on_view_change)
+        self.canvas.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.canvas)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # index -> (widget, canvas window id), plus the ones not in use
+        self.rows = {}
+        self.spare = []
+        self.created = 0
+
+        self.refresh()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        widget.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+        widget.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-e.delta // 120, "units"))
+
+    def refresh(self):
+        """Re-read the count and re-render the visible rows"""
+        count = self.source.count()
+        self.canvas.configure(
+            scrollregion=(0, 0, self.canvas.winfo_width(), count * self.row_height),
+            yscrollincrement=self.row_height
+        )
+        for index in list(self.rows):
+            self.spare.append(self.rows.pop(index))
+        self._update()
+
+    def _on_view_change(self, first, last):
+        self.scrollbar.set(first, last)
+        self._update()
+
+    def _on_resize(self, event):
+        for _, window in list(self.rows.values()) + self.spare:
+            self.canvas.itemconfigure(window, width=event.width)
+        self._update()
+
+    def _update(self):
+        count = self.source.count()
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first = max(0, int(top // self.row_height) - self.overscan)
+        last = min(count, int(bottom // self.row_height) + 1 + self.overscan)
+
+        for index in [i for i in self.rows if not first <= i < last]:
+            self.spare.append(self.rows.pop(index))
+
+        for index in range(first, last):
+            if index in self.rows:
+                continue
+            item = self.source.get(index)
+            if item is None:
+                continue
+            y = index * self.row_height
+            if self.spare:
+                widget, window = self.spare.pop()
+                self.canvas.coords(window, 0, y)
+                self.canvas.itemconfigure(window, state="normal")
+            else:
+                widget = self.make_row(self.canvas)
+                self._bind_wheel(widget)
+                window = self.canvas.create_window(
+                    0, y, window=widget, anchor="nw",
+                    width=self.canvas.winfo_width(), height=self.row_height
+                )
+                self.created += 1
+            self.render(widget, item)
+            self.rows[index] = (widget, window)
+
+        for _, window in self.spare:
+            self.canvas.itemconfigure(window, state="hidden")
+
+    def stats(self):
+        return {'rows': self.source.count(), 'widgets': self.created, 'visible': len(self.rows)}
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def destroy(self):
+        self.frame.destroy()